@@ -0,0 +1,245 @@
+"""Headless JSON API: Tab 1 best match and Tab 2 head-to-head without Streamlit.
+
+    python api.py --port 8600 --workers 4
+
+    GET  /v1/best?persona=Gamer&os=iOS&max_price=900&min_cam=8&chip=Snapdragon&k=6
+    GET  /v1/compare?a=<model name>&b=<model name>&judge=camera
+    POST /v1/batch     {"queries": [{"kind": "best", ...}, {"kind": "compare", ...}]}
+    GET  /v1/health
+    GET  /metrics      Prometheus text
+
+Same sheet, snapshot directory, scoring and judges as the app. One indexed
+snapshot of the catalog is shared by every request and swapped whole when
+the sheet changes; ranking runs on a thread pool (the heavy parts are numpy
+calls that release the GIL) so the event loop only parses and serializes.
+"""
+import argparse
+import asyncio
+import math
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import numpy as np
+import pandas as pd
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+import metrics
+from catalog import SHEET_URL, CatalogRefresher
+from engine import JUDGES, OS_CHOICES, PERSONAS, SCORE_COLS, CatalogIndex, ScoreEngine, TopKCache, find_judge, find_persona
+from query import QueryIndex, best_match
+from snapshot import SNAPSHOT_DIR
+
+ROW_FIELDS = ['name', 'price', 'os_type', 'brand', 'chipset', 'link'] + SCORE_COLS
+MAX_K = 50
+MAX_BATCH = 200
+
+
+class Snapshot:
+    # Everything one data version needs, built off the event loop and then
+    # published with a single reference swap
+    def __init__(self, df, version, matrix=None):
+        self.version = version
+        self.engine = ScoreEngine(df, matrix)
+        self.topk = TopKCache(k=6)
+        self.topk.refresh(self.engine, version)
+        self.query_index = QueryIndex(self.engine)
+        self.catalog_index = CatalogIndex(self.engine)
+
+    def row(self, pos):
+        row = self.engine.row(pos)
+        return {f: _plain(row[f]) for f in ROW_FIELDS if f in row}
+
+
+def _plain(v):
+    # numpy scalars -> Python, NaN -> null (JSON has no NaN)
+    if isinstance(v, np.float32):
+        v = float(str(v))  # shortest float32 repr: 7.8, not 7.800000190734863
+    elif isinstance(v, np.generic):
+        v = v.item()
+    if (isinstance(v, float) and math.isnan(v)) or v is pd.NA:
+        return None
+    return v
+
+
+def _number(params, name, cast=float):
+    v = params.get(name)
+    if v is None or v == "":
+        return None
+    try:
+        v = cast(v)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"{name} must be a number") from None
+    # nan would read as "no cap" in max_price and match nothing in min_cam
+    if not math.isfinite(v) or v < 0:
+        raise ValueError(f"{name} must be a finite, non-negative number")
+    return v
+
+
+def _text(params, name, default=None):
+    # batch queries are arbitrary JSON: a number or list here is a bad query,
+    # not a server error
+    v = params.get(name)
+    if v is None or v == "":
+        return default
+    if not isinstance(v, str):
+        raise ValueError(f"{name} must be a string")
+    return v
+
+
+def _label(params, name, labels, default):
+    # "gamer", "Camera" or the full label; absent -> the app's default, but an
+    # unknown or ambiguous label is a bad query rather than a silent fallback
+    label = _text(params, name)
+    if label is None:
+        return default
+    found = [x for x in labels if label.lower() in x.lower()]
+    if len(found) != 1:
+        raise ValueError(f"{name} must name one of {list(labels)}")
+    return found[0]
+
+
+def answer_best(snap, params):
+    persona = _label(params, 'persona', PERSONAS, find_persona(""))
+    os_choice = _text(params, 'os', "Any")
+    if os_choice not in OS_CHOICES:
+        raise ValueError(f"os must be one of {OS_CHOICES}")
+    k = min(max(_number(params, 'k', int) or 6, 1), MAX_K)
+    top = best_match(snap.topk, snap.query_index, snap.version, persona, os_choice, _number(params, 'max_price'), _number(params, 'min_cam'), _text(params, 'chip'), k)
+    return {'version': snap.version, 'persona': persona, 'os': os_choice, 'results': [snap.row(p) for p in top]}
+
+
+def answer_compare(snap, params):
+    index = snap.catalog_index
+    a, b = _text(params, 'a'), _text(params, 'b')
+    for name in (a, b):
+        if name not in index.positions:
+            raise LookupError(f"unknown model: {name}")
+    judge = _label(params, 'judge', JUDGES, find_judge(None))
+    a_wins = index.head_to_head(a, b, judge)
+    scores = index.judge_scores[judge]
+    return {
+        'version': snap.version,
+        'judge': judge,
+        'winner': 'a' if a_wins else 'b',
+        'a': {**snap.row(index.positions[a]), 'judge_score': _plain(scores[index.positions[a]])},
+        'b': {**snap.row(index.positions[b]), 'judge_score': _plain(scores[index.positions[b]])},
+    }
+
+
+ANSWERS = {'best': answer_best, 'compare': answer_compare}
+
+
+def answer_batch(snap, queries):
+    # one pool job for the whole batch; a bad query fails alone
+    out = []
+    for q in queries:
+        try:
+            if not isinstance(q, dict) or not isinstance(q.get('kind'), str) or q['kind'] not in ANSWERS:
+                raise ValueError(f"kind must be one of {list(ANSWERS)}")
+            out.append(ANSWERS[q['kind']](snap, q))
+        except (LookupError, ValueError) as e:
+            out.append({'error': str(e)})
+    return {'version': snap.version, 'results': out}
+
+
+class Api:
+    def __init__(self, catalog, workers=4, poll=5):
+        self.catalog = catalog
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="api")
+        self.poll = poll
+        self.snapshot = None
+
+    async def refresh(self):
+        # the refresher fetches in its own thread; this only notices a new
+        # version and indexes it in the pool before swapping it in
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.pool, self.catalog.maybe_refresh)
+        df, version, matrix = self.catalog.current()
+        if self.snapshot is None or self.snapshot.version != version:
+            with metrics.span('api_snapshot_build'):
+                self.snapshot = await loop.run_in_executor(self.pool, Snapshot, df, version, matrix)
+
+    async def refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.poll)
+            try:
+                await self.refresh()
+            except Exception:
+                metrics.inc('api_refresh_error')
+
+    async def _run(self, name, fn, arg):
+        metrics.inc(f'api_{name}_requests')
+        snap = self.snapshot
+        with metrics.span(f'api_{name}'):
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(self.pool, fn, snap, arg)
+            except LookupError as e:
+                return JSONResponse({'error': str(e)}, status_code=404)
+            except ValueError as e:
+                return JSONResponse({'error': str(e)}, status_code=400)
+        return JSONResponse(result)
+
+    async def best(self, request):
+        return await self._run('best', answer_best, dict(request.query_params))
+
+    async def compare(self, request):
+        return await self._run('compare', answer_compare, dict(request.query_params))
+
+    async def batch(self, request):
+        try:
+            queries = (await request.json())['queries']
+        except (ValueError, KeyError, TypeError):
+            return JSONResponse({'error': 'body must be {"queries": [...]}'}, status_code=400)
+        if not isinstance(queries, list) or len(queries) > MAX_BATCH:
+            return JSONResponse({'error': f'queries must be a list of at most {MAX_BATCH}'}, status_code=400)
+        metrics.observe('api_batch_size', len(queries))
+        return await self._run('batch', answer_batch, queries)
+
+    async def health(self, request):
+        snap = self.snapshot
+        return JSONResponse({
+            'version': snap.version,
+            'rows': len(snap.engine),
+            'judges': list(JUDGES),
+            'last_error': self.catalog.last_error,
+        })
+
+    async def prometheus(self, request):
+        return PlainTextResponse(metrics.REGISTRY.to_prometheus())
+
+
+def create_app(api):
+    @asynccontextmanager
+    async def lifespan(app):
+        await api.refresh()  # serve nothing until the first snapshot is indexed
+        task = asyncio.create_task(api.refresh_loop())
+        yield
+        task.cancel()
+        api.pool.shutdown(wait=False)
+
+    return Starlette(routes=[
+        Route('/v1/best', api.best),
+        Route('/v1/compare', api.compare),
+        Route('/v1/batch', api.batch, methods=['POST']),
+        Route('/v1/health', api.health),
+        Route('/metrics', api.prometheus),
+    ], lifespan=lifespan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--workers", type=int, default=4, help="ranking threads")
+    parser.add_argument("--ttl", type=int, default=60, help="seconds between sheet fetches")
+    args = parser.parse_args()
+
+    catalog = CatalogRefresher(SHEET_URL, ttl=args.ttl, snapshot_dir=SNAPSHOT_DIR)
+    uvicorn.run(create_app(Api(catalog, args.workers)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,16 @@
+import json
+import os
+import time
 import streamlit as st
-import pandas as pd
 import random
-import google.generativeai as genai
+import metrics
+from catalog import SHEET_URL, CatalogRefresher
+from snapshot import SNAPSHOT_DIR
+from engine import PERSONAS, OS_CHOICES, JUDGES, CatalogIndex, ScoreEngine, TopKCache, find_persona
+from query import QueryIndex, best_match
+from similar import SimilarityIndex
+from budget import BudgetIndex
+from render import FragmentCache, alt_card_html, vs_card_html, winner_card_html
 
 # --- 1. CONFIGURATION ---
 st.set_page_config(
@@ -17,7 +26,7 @@ st.markdown("""
     @import url('https://fonts.googleapis.com/css2?family=JetBrains+Mono:wght@400;700&family=Inter:wght@400;600;900&display=swap');
     
     .stApp { background-color: #000000 !important; }
-    .stSelectbox label, .stNumberInput label, .stTextInput label { color: #FFFFFF !important; font-weight: bold !important; }
+    .stSelectbox label, .stNumberInput label, .stTextInput label, .stSlider label { color: #FFFFFF !important; font-weight: bold !important; }
     p, span, div { color: #FFFFFF; }
 
     /* Expander Fix */
@@ -68,83 +77,95 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- 3. DATA & LOGIC ---
-@st.cache_data(ttl=60)
-def load_data():
-    sheet_url = "https://docs.google.com/spreadsheets/d/e/2PACX-1vQqoziKy640ID3oDos-DKk49txgsNPdMJGb_vAH1_WiRG88kewDPneVgo9iSHq2u5DXYI_g_n6se14k/pub?output=csv"
-    try:
-        df = pd.read_csv(sheet_url)
-    except Exception:
-        return pd.DataFrame()
-
-    if not df.empty:
-        df = df.dropna(subset=['name', 'price'])
-        
-        def get_os(name):
-            name_str = str(name).lower()
-            if 'iphone' in name_str or 'ipad' in name_str: return 'iOS'
-            return 'Android'
-        df['os_type'] = df['name'].apply(get_os)
-        
-        def get_brand_score(name):
-            n = str(name).lower()
-            if 'iphone' in n or 'apple' in n: return 10.0
-            if 'samsung' in n or 'galaxy' in n: return 10.0
-            if 'google' in n: return 9.5
-            return 9.0 
-        df['brand_score'] = df['name'].apply(get_brand_score)
-        
-        max_antutu = df['antutu'].max() if 'antutu' in df.columns else 1
-        max_cam = df['camera'].max() if 'camera' in df.columns else 10
-        max_batt = df['battery'].max() if 'battery' in df.columns else 10
-        max_price = df['price'].max() if 'price' in df.columns else 2000
-        
-        if 'antutu' in df.columns: df['perf_score'] = (df['antutu'] / max_antutu) * 10
-        else: df['perf_score'] = 5.0 
-        if 'camera' in df.columns: df['cam_score'] = (df['camera'] / max_cam) * 10
-        else: df['cam_score'] = 5.0
-        if 'battery' in df.columns: df['batt_score'] = (df['battery'] / max_batt) * 10
-        else: df['batt_score'] = 5.0
-
-        # Dynamic Value Score
-        if max_price > 0:
-            df['value'] = 10 * (1 - (df['price'] / max_price)) + 1 
-            df['value'] = df['value'].clip(0, 10)
-        else:
-            df['value'] = 5.0
-            
-        if 'antutu' not in df.columns: df['antutu'] = df['price'] * 2000
-        my_tag = "techchoose-20"
-        df['link'] = df['link'].apply(lambda x: f"{x}&tag={my_tag}" if '?' in str(x) else f"{x}?tag={my_tag}")
-    return df
+@st.cache_resource
+def get_catalog():
+    return CatalogRefresher(SHEET_URL, ttl=60, snapshot_dir=SNAPSHOT_DIR)
 
-df = load_data()
+def load_data():
+    # shared across sessions; refetches at most once per ttl and keeps the last
+    # good snapshot when the sheet can't be reached
+    catalog = get_catalog()
+    catalog.maybe_refresh()
+    return catalog.current()
+
+@st.cache_resource(max_entries=1)
+def get_engine(version, _df, _matrix=None):
+    with metrics.span('engine_build'):
+        return ScoreEngine(_df, _matrix)
+
+@st.cache_resource(max_entries=1)
+def get_catalog_index(version, _engine):
+    with metrics.span('catalog_index_build'):
+        return CatalogIndex(_engine)
+
+@st.cache_resource(max_entries=1)
+def get_query_index(version, _engine):
+    with metrics.span('query_index_build'):
+        return QueryIndex(_engine)
+
+@st.cache_resource(max_entries=1)
+def get_similar_index(version, _engine):
+    with metrics.span('similar_index_build'):
+        return SimilarityIndex(_engine)
+
+@st.cache_resource(max_entries=1)
+def get_budget_index(version, _engine):
+    with metrics.span('budget_index_build'):
+        return BudgetIndex(_engine)
+
+@st.cache_resource
+def get_topk_cache():
+    return TopKCache(k=6)
+
+@st.cache_resource
+def get_fragment_cache():
+    return FragmentCache(max_bytes=16 * 1024 * 1024)
+
+@st.cache_resource
+def start_metrics_dump():
+    # TECHCHOOSE_METRICS_DUMP=static/metrics.json + server.enableStaticServing
+    # makes the dump scrapeable at /app/static/metrics.json
+    path = os.environ.get("TECHCHOOSE_METRICS_DUMP")
+    return metrics.REGISTRY.start_dump_thread(path) if path else None
+
+def current_catalog():
+    # -> (df, data version, engine). Called by every tab fragment too: fragment
+    # reruns skip this module-level code, and a tab that kept the engine from
+    # the last full run would serve a stale catalog for as long as the visitor
+    # stayed in it
+    with metrics.span('load_data'):
+        df, version, matrix = load_data()
+    return df, version, get_engine(version, df, matrix)
+
+start_metrics_dump()
+metrics.inc('reruns')
+current_catalog()  # warm-up: the first full run fetches and indexes before the tabs draw
+fragments = get_fragment_cache()
 
 # --- 4. HELPERS ---
-def get_dynamic_badge(mode, price):
-    if "High-End" in mode: return "💎 MARKET LEADER"
-    elif "Gamer" in mode: return "🏆 GAMING BEAST"
-    elif "Creator" in mode: return "🎥 CREATOR CHOICE"
-    elif "Student" in mode: return "💰 SMART CHOICE"
-    else: return "⭐ BEST OVERALL"
-
-def stat_bar_html(label, score, color):
-    width = min(score * 10, 100)
-    return f"<div style='background:#151515;padding:8px;border-radius:8px;text-align:center;border:1px solid #333;margin-bottom:5px;'><div style='color:#888 !important;font-size:0.65em;font-weight:700;margin-bottom:4px;'>{label}</div><div style='font-size:1.1em;font-weight:900;color:white !important;'>{score:.1f}</div><div style='background:#333;height:4px;border-radius:2px;margin-top:4px;overflow:hidden;'><div style='width:{width}%;height:100%;background:{color};'></div></div></div>"
-
-def get_reason_badge_html(winner_row, current_row):
-    badges = ""
-    diff = winner_row['price'] - current_row['price']
-    if diff >= 50:
-        badges += f"<span style='background:rgba(16,185,129,0.2);color:#10B981 !important;border:1px solid #10B981;padding:2px 6px;border-radius:4px;font-size:0.7em;font-weight:bold;margin-left:8px;'>SAVE ${int(diff):,}</span>"
-    if current_row['perf_score'] > (winner_row['perf_score'] + 0.3):
-        badges += "<span style='background:rgba(59,130,246,0.2);color:#3B82F6 !important;border:1px solid #3B82F6;padding:2px 6px;border-radius:4px;font-size:0.7em;font-weight:bold;margin-left:8px;'>🚀 FASTER</span>"
-    return badges
-
-def get_score_badge_html(icon, label, score):
-    if score >= 9.5: c, b = "#10B981", "rgba(16,185,129,0.4)"
-    elif score >= 8.5: c, b = "#3B82F6", "rgba(59,130,246,0.4)"
-    else: c, b = "#F59E0B", "rgba(245,158,11,0.4)"
-    return f"<div style='display:inline-flex;align-items:center;background:rgba(0,0,0,0.5);border:1px solid {b};border-radius:6px;padding:3px 8px;margin-right:6px;'><span style='font-size:1em;margin-right:4px;'>{icon}</span><span style='color:#888 !important;font-size:0.6em;font-weight:700;margin-right:4px;text-transform:uppercase;'>{label}</span><span style='color:{c} !important;font-weight:900;font-family:monospace;font-size:0.9em;'>{score:.1f}</span></div>"
+def tab_is_open(tab):
+    # None = this Streamlit can't tell, so run the tab
+    return getattr(tab, "open", None) is not False
+
+def get_admin_password():
+    # ดึงรหัสผ่านจาก Secrets ที่เราตั้งไว้เมื่อกี้
+    if "ADMIN_PASSWORD" in st.secrets:
+        return st.secrets["ADMIN_PASSWORD"]
+    return "tech1234" # รหัสสำรองเผื่อลืมตั้งค่า
+
+def budget_step_chart(engine, budget_index, os_choice, persona, step=100):
+    # plotly is only imported once someone opens the budget chart
+    import plotly.graph_objects as go
+    budgets, positions, scores = budget_index.steps(os_choice, persona, step)
+    names = engine.df['name'].to_numpy()
+    prices = engine.price
+    hover = [f"{names[p]}<br>${prices[p]:,.0f}" if p >= 0 else "—" for p in positions]
+    fig = go.Figure(go.Bar(x=budgets, y=scores, hovertext=hover, hoverinfo="text+x", marker_color="#F59E0B"))
+    fig.update_layout(
+        template="plotly_dark", paper_bgcolor="#000", plot_bgcolor="#000", height=320,
+        margin=dict(l=10, r=10, t=10, b=10), xaxis_title="Budget ($)", yaxis_title="Match score",
+    )
+    return fig
 
 def generate_ai_analysis(winner, loser, reason_mode):
     w_name = winner['name']
@@ -171,161 +192,137 @@ st.title("🛒 TechChoose Smart AI")
 st.markdown("<div style='margin-bottom:20px; color:#888 !important;'>📅 Data Updated: 20/12/2025</div>", unsafe_allow_html=True)
 
 # 🚀 เพิ่ม Tab 3 ตรงนี้
-tab1, tab2, tab3 = st.tabs(["🔍 FIND BEST MATCH", "⚔️ COMPARE MODELS", "🤖 ADMIN AI"])
+# Each tab body is a fragment: its own widgets only rerun that tab. With
+# on_change="rerun" Streamlit also tracks the selected tab, so tabs the visitor
+# never opens are not executed at all (older Streamlit runs every tab).
+TAB_NAMES = ["🔍 FIND BEST MATCH", "⚔️ COMPARE MODELS", "🤖 ADMIN AI", "📈 OPS"]
+try:
+    tab1, tab2, tab3, tab4 = st.tabs(TAB_NAMES, key="main_tabs", on_change="rerun")
+except TypeError:
+    tab1, tab2, tab3, tab4 = st.tabs(TAB_NAMES)
 
 # ==========================================
 # TAB 1: SMART MATCHING ENGINE
 # ==========================================
-with tab1:
+@st.fragment
+def render_match_tab():
+    df, data_ver, engine = current_catalog()
+    topk_cache = get_topk_cache()
+    topk_cache.refresh(engine, data_ver)
+    query_index = get_query_index(data_ver, engine)
+
     with st.expander("🔍 **TAP TO CUSTOMIZE**", expanded=True):
         c1, c2 = st.columns(2)
-        with c1: os_choice = st.selectbox("Operating System", ["Any", "iOS", "Android"], key="t1_os")
-        with c2: lifestyle = st.selectbox("User Persona", ["💎 Ultimate High-End", "🏠 General Use", "🎮 Gamer", "📸 Creator", "💰 Student (Best Value)"], key="t1_life")
-        if st.button("🚀 UPDATE RESULTS", type="primary", use_container_width=True): st.rerun()
+        with c1: os_choice = st.selectbox("Operating System", OS_CHOICES, key="t1_os")
+        with c2: lifestyle = st.selectbox("User Persona", list(PERSONAS), key="t1_life")
+        c3, c4, c5 = st.columns(3)
+        with c3: max_price = st.number_input("Max Price ($)", min_value=0, value=0, step=50, help="0 = use the persona budget; anything else replaces it", key="t1_price")
+        with c4: min_cam = st.slider("Min Camera Score", 0.0, 10.0, 0.0, 0.5, key="t1_cam")
+        with c5: chip_family = st.selectbox("Chipset", ["Any"] + query_index.values('chip_family'), key="t1_chip")
+        if st.button("🚀 UPDATE RESULTS", type="primary", use_container_width=True): st.rerun(scope="fragment")
 
     st.divider()
 
     if not df.empty:
-        df_f = df.copy()
-        if "iOS" in os_choice: df_f = df_f[df_f['os_type']=='iOS']
-        elif "Android" in os_choice: df_f = df_f[df_f['os_type']=='Android']
-        
-        # Weighting Logic
-        if "High-End" in lifestyle: 
-            p,c,b,v,br = 10, 10, 10, 0, 5 
-            budget = 9999
-        elif "Gamer" in lifestyle: 
-            p,c,b,v,br = 25, 3, 10, 5, 2
-            budget = 2000
-        elif "Creator" in lifestyle:
-            p,c,b,v,br = 6, 25, 7, 3, 4
-            budget = 2000
-        elif "Student" in lifestyle:
-            budget = 900 
-            p,c,b,v,br = 7, 6, 8, 15, 2
-            df_f = df_f[df_f['perf_score'] >= 4.0]
-        else: 
-            budget = 1500
-            p,c,b,v,br = 6, 6, 6, 12, 3
-            
-        df_f = df_f[df_f['price'] <= budget]
-        df_f['final_score'] = (df_f['perf_score']*p) + (df_f['cam_score']*c) + (df_f['batt_score']*b) + (df_f['value']*v) + (df_f['brand_score']*br)
-        df_f = df_f.sort_values('final_score', ascending=False).reset_index(drop=True)
-
-        if len(df_f) > 0:
-            winner = df_f.iloc[0]
-            s1 = stat_bar_html('🚀 SPEED', winner['perf_score'], '#3B82F6')
-            s2 = stat_bar_html('📸 CAM', winner['cam_score'], '#A855F7')
-            s3 = stat_bar_html('🔋 BATT', winner['batt_score'], '#10B981')
-            stats = f"<div style='display:grid;grid-template-columns:1fr 1fr 1fr;gap:10px;margin:20px 0;'>{s1}{s2}{s3}</div>"
-            
-            st.markdown(f"""
-            <div class='winner-box'>
-                <div style='background:#F59E0B;color:black !important;padding:5px 15px;border-radius:20px;display:inline-block;font-weight:900;font-size:0.8em;margin-bottom:10px;'>{get_dynamic_badge(lifestyle, winner['price'])}</div>
-                <div class='hero-title'>{winner['name']}</div>
-                <div class='hero-price'>${winner['price']:,}</div>
-                {stats}
-                <a href='{winner['link']}' target='_blank' class='amazon-btn'>👉 VIEW DEAL</a>
-            </div>
-            """, unsafe_allow_html=True)
-
-            st.subheader("🥈 Top Alternatives")
-            for i, row in df_f.iloc[1:6].iterrows():
-                rank_num = i + 1
-                rank_col = "#E0E0E0" if rank_num == 2 else "#E6AC75" if rank_num == 3 else "#333"
-                badges = get_reason_badge_html(winner, row)
-                scores = f"{get_score_badge_html('🚀','Speed',row['perf_score'])}{get_score_badge_html('📸','Cam',row['cam_score'])}{get_score_badge_html('🔋','Batt',row['batt_score'])}"
-                
-                st.markdown(f"""
-                <a href='{row['link']}' target='_blank' class='alt-link'>
-                    <div class='alt-card'>
-                        <div style='display:flex;align-items:center;'>
-                            <div style='width:35px;height:35px;background:{rank_col};color:{'black' if rank_num<4 else '#888'} !important;display:flex;align-items:center;justify-content:center;font-weight:900;border-radius:8px;margin-right:15px;font-size:1.2em;'>{rank_num}</div>
-                            <div style='flex-grow:1;'>
-                                <div style='color:white !important;font-weight:bold;font-size:1.1em;margin-bottom:5px;'>{row['name']} {badges}</div>
-                                <div style='color:#FBBF24 !important;font-weight:bold;'>${row['price']:,}</div>
-                                <div style='margin-top:8px;'>{scores}</div>
-                            </div>
-                            <div style='color:#F59E0B !important;font-weight:bold;font-size:0.8em;'>VIEW ></div>
-                        </div>
-                    </div>
-                </a>
-                """, unsafe_allow_html=True)
+        persona = find_persona(lifestyle)
+        with metrics.span('tab1_rank'):
+            top = best_match(topk_cache, query_index, data_ver, persona, os_choice, max_price, min_cam, chip_family)
+        if len(top) > 0:
+            # cards are keyed by (row position, data version, persona ...) and
+            # shared across sessions; each section goes out as one st.markdown
+            with metrics.span('tab1_render'):
+                winner = engine.row(top[0])
+                st.markdown(fragments.get(("winner", top[0], data_ver, lifestyle), lambda: winner_card_html(winner, lifestyle)), unsafe_allow_html=True)
+
+                st.subheader("🥈 Top Alternatives")
+                alts = []
+                for rank_num, pos in enumerate(top[1:6], start=2):
+                    row = engine.row(pos)
+                    alts.append(fragments.get(("alt", pos, data_ver, top[0], rank_num), lambda: alt_card_html(winner, row, rank_num)))
+                st.markdown(f"<div>{''.join(alts)}</div>", unsafe_allow_html=True)
+
+            with metrics.span('tab1_similar'):
+                similar = get_similar_index(data_ver, engine).neighbours(top[0], k=3, os_choice=os_choice, cheaper=True)
+            if len(similar) > 0:
+                st.subheader("🧬 Similar, But Cheaper")
+                cards = [fragments.get(("similar", pos, data_ver, top[0]), lambda: alt_card_html(winner, engine.row(pos), 4, mark="≈")) for pos in similar]
+                st.markdown(f"<div>{''.join(cards)}</div>", unsafe_allow_html=True)
+
+        # best phone at any budget for this persona / OS: a binary search over
+        # the precomputed price/score frontier, no rescoring
+        budget_index = get_budget_index(data_ver, engine)
+        prices, _, _ = budget_index.frontier(os_choice, persona)
+        if len(prices) > 0:
+            with st.expander("📈 **BEST PHONE AT EVERY BUDGET**"):
+                top_price = int(prices[-1])
+                budget = st.slider("Budget ($)", 0, top_price, min(PERSONAS[persona][1], top_price), 50, key="t1_budget")
+                with metrics.span('tab1_budget'):
+                    pos = budget_index.best(os_choice, persona, budget)
+                if pos is None:
+                    st.caption("Nothing matches at this budget.")
+                else:
+                    row = engine.row(pos)
+                    st.markdown(f"**\\${budget:,}** gets you **{row['name']}** at \\${row['price']:,}")  # \\$: not LaTeX
+                st.plotly_chart(budget_step_chart(engine, budget_index, os_choice, persona), use_container_width=True)
 
 # ==========================================
 # TAB 2: VS MODE
 # ==========================================
-with tab2:
+@st.fragment
+def render_compare_tab():
+    df, data_ver, engine = current_catalog()
     st.subheader("🥊 Head-to-Head Comparison")
-    all_models = sorted(df['name'].unique())
+    catalog_index = get_catalog_index(data_ver, engine)
+    all_models = catalog_index.models
     
     with st.form("compare_form"):
         c1, c2 = st.columns(2)
         with c1: p1_name = st.selectbox("Select Phone A", all_models, index=0)
         with c2: p2_name = st.selectbox("Select Phone B", all_models, index=1 if len(all_models)>1 else 0)
-        judge = st.selectbox("Decide Winner By:", ["💎 Overall Specs", "🎮 Gaming Performance", "📸 Camera Quality"])
+        judge = st.selectbox("Decide Winner By:", list(JUDGES))
         submitted = st.form_submit_button("⚔️ ANALYZE & COMPARE", type="primary", use_container_width=True)
     
     if submitted:
-        r1 = df[df['name'] == p1_name].iloc[0]
-        r2 = df[df['name'] == p2_name].iloc[0]
-        
-        w_p, w_c, w_b, w_v, w_br = 1, 1, 1, 1, 1
-        if "Gaming" in judge: w_p, w_c, w_b, w_v, w_br = 10, 0, 3, 1, 1
-        elif "Camera" in judge: w_p, w_c, w_b, w_v, w_br = 2, 10, 3, 1, 1
+        r1 = catalog_index.row(p1_name)
+        r2 = catalog_index.row(p2_name)
         
-        s1 = (r1['perf_score']*w_p) + (r1['cam_score']*w_c) + (r1['batt_score']*w_b) + (r1['value']*w_v) + (r1['brand_score']*w_br)
-        s2 = (r2['perf_score']*w_p) + (r2['cam_score']*w_c) + (r2['batt_score']*w_b) + (r2['value']*w_v) + (r2['brand_score']*w_br)
-        
-        win_idx = 1 if s1 >= s2 else 2
+        with metrics.span('tab2_compare'):
+            win_idx = 1 if catalog_index.head_to_head(p1_name, p2_name, judge) else 2
         win_row, lose_row = (r1, r2) if win_idx == 1 else (r2, r1)
         
-        # UI Helpers
-        c1_cls = "vs-winner-border" if win_idx == 1 else ""
-        c2_cls = "vs-winner-border" if win_idx == 2 else ""
-        rec1 = "<div style='color:#00FF99 !important;font-weight:900;margin-bottom:10px;'>👑 WINNER</div>" if win_idx == 1 else "<div style='height:29px'></div>"
-        rec2 = "<div style='color:#00FF99 !important;font-weight:900;margin-bottom:10px;'>👑 WINNER</div>" if win_idx == 2 else "<div style='height:29px'></div>"
-
-        def create_vs_row(icon, label, v1, v2, is_fmt=False):
-            val1, val2 = (f"{int(v1):,}", f"{int(v2):,}") if is_fmt else (f"{v1:.1f}", f"{v2:.1f}")
-            c1, c2 = ("val-win", "val-lose") if v1 >= v2 else ("val-lose", "val-win")
-            return f"<div class='vs-row'><div class='vs-label'><span>{icon}</span> {label}</div><div class='{c1}'>{val1}</div></div>", \
-                   f"<div class='vs-row'><div class='vs-label'><span>{icon}</span> {label}</div><div class='{c2}'>{val2}</div></div>"
-
-        r_chip = ("", "")
-        if 'chipset' in df.columns:
-             t1 = r1['chipset'] if pd.notna(r1['chipset']) else "-"
-             t2 = r2['chipset'] if pd.notna(r2['chipset']) else "-"
-             r_chip = (f"<div class='vs-row'><div class='vs-label'><span>🧠</span> Chipset</div><div style='color:white !important;font-weight:bold;'>{t1}</div></div>", f"<div class='vs-row'><div class='vs-label'><span>🧠</span> Chipset</div><div style='color:white !important;font-weight:bold;'>{t2}</div></div>")
-
-        r_antutu = create_vs_row("🚀", "AnTuTu", r1['antutu'], r2['antutu'], True)
-        r_speed = create_vs_row("⚡", "Speed", r1['perf_score'], r2['perf_score'])
-        r_cam = create_vs_row("📸", "Cam", r1['cam_score'], r2['cam_score'])
-        r_batt = create_vs_row("🔋", "Batt", r1['batt_score'], r2['batt_score'])
+        pos1, pos2 = catalog_index.positions[p1_name], catalog_index.positions[p2_name]
+        show_chip = 'chipset' in df.columns
+        with metrics.span('tab2_render'):
+            card1 = fragments.get(("vs", pos1, pos2, True, win_idx == 1, data_ver), lambda: vs_card_html(r1, r2, win_idx == 1, True, show_chip))
+            card2 = fragments.get(("vs", pos2, pos1, False, win_idx == 2, data_ver), lambda: vs_card_html(r2, r1, win_idx == 2, False, show_chip))
 
         st.divider()
         st.markdown(f"<div class='ai-box'><div class='ai-header'><span>🤖</span> AI ANALYST VERDICT</div>{generate_ai_analysis(win_row, lose_row, judge)}</div>", unsafe_allow_html=True)
         st.write("") 
 
+        # cheaper look-alikes of each phone, same OS as that phone
+        similar_index = get_similar_index(data_ver, engine)
         col_a, col_b = st.columns(2)
-        with col_a:
-            st.markdown(f"<div class='vs-card {c1_cls}'>{rec1}<div class='hero-title' style='font-size:1.5em !important;'>{r1['name']}</div><div class='hero-price' style='font-size:1.5em !important;'>${r1['price']:,}</div>{r_chip[0]}{r_antutu[0]}{r_speed[0]}{r_cam[0]}{r_batt[0]}<a href='{r1['link']}' target='_blank' class='amazon-btn'>VIEW DEAL</a></div>", unsafe_allow_html=True)
-        with col_b:
-            st.markdown(f"<div class='vs-card {c2_cls}'>{rec2}<div class='hero-title' style='font-size:1.5em !important;'>{r2['name']}</div><div class='hero-price' style='font-size:1.5em !important;'>${r2['price']:,}</div>{r_chip[1]}{r_antutu[1]}{r_speed[1]}{r_cam[1]}{r_batt[1]}<a href='{r2['link']}' target='_blank' class='amazon-btn'>VIEW DEAL</a></div>", unsafe_allow_html=True)
+        for col, card, pos, row in [(col_a, card1, pos1, r1), (col_b, card2, pos2, r2)]:
+            with col:
+                st.markdown(card, unsafe_allow_html=True)
+                with metrics.span('tab2_similar'):
+                    similar = similar_index.neighbours(pos, k=3, os_choice=row['os_type'], cheaper=True)
+                if len(similar) > 0:
+                    st.caption("🧬 SIMILAR, BUT CHEAPER")
+                    cards = [fragments.get(("similar", p, data_ver, pos), lambda: alt_card_html(row, engine.row(p), 4, mark="≈")) for p in similar]
+                    st.markdown(f"<div>{''.join(cards)}</div>", unsafe_allow_html=True)
 
 # ==========================================
 # TAB 3: ADMIN AI TOOL (Secure & Auto-Login)
 # ==========================================
-with tab3:
+@st.fragment
+def render_admin_tab():
     st.header("🤖 ADMIN AI CONSOLE")
     st.caption("🔒 Secured Area for Post Generation")
     
     # --- ส่วนเช็ค Password ---
-    # ดึงรหัสผ่านจาก Secrets ที่เราตั้งไว้เมื่อกี้
-    if "ADMIN_PASSWORD" in st.secrets:
-        stored_password = st.secrets["ADMIN_PASSWORD"]
-    else:
-        stored_password = "tech1234" # รหัสสำรองเผื่อลืมตั้งค่า
+    stored_password = get_admin_password()
 
     with st.expander("🔑 Login to Access", expanded=True):
         password_input = st.text_input("Admin Password:", type="password")
@@ -356,6 +353,8 @@ with tab3:
                 st.error("Missing API Key or Question")
             else:
                 try:
+                    # heavy SDK, only imported once an admin actually generates
+                    import google.generativeai as genai
                     genai.configure(api_key=api_key)
                     model = genai.GenerativeModel('gemini-pro')
                     prompt = f"""
@@ -380,6 +379,51 @@ with tab3:
     elif password_input:
         st.error("❌ Wrong Password")
 
+# ==========================================
+# TAB 4: OPS DIAGNOSTICS (same admin password)
+# ==========================================
+@st.fragment
+def render_ops_tab():
+    df, data_ver, engine = current_catalog()
+    st.header("📈 OPS DIAGNOSTICS")
+    st.caption("🔒 Stage timings and cache hit rates for this server process")
+
+    with st.expander("🔑 Login to Access", expanded=True):
+        ops_password = st.text_input("Admin Password:", type="password", key="ops_pw")
+
+    if ops_password == get_admin_password():
+        catalog = get_catalog()
+        metrics.gauge('fragment_cache_bytes', fragments.size)
+        metrics.gauge('fragment_cache_entries', len(fragments))
+        metrics.gauge('fragment_cache_hits', fragments.hits)
+        metrics.gauge('fragment_cache_misses', fragments.misses)
+        snap = metrics.REGISTRY.snapshot()
+
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Catalog rows", len(df))
+        c2.metric("Data version", data_ver)
+        c3.metric("Last fetch", f"{time.time() - catalog.fetched_at:.0f}s ago" if catalog.fetched_at else "never")
+        lookups = fragments.hits + fragments.misses
+        c4.metric("Card cache hit rate", f"{fragments.hits / lookups:.0%}" if lookups else "-")
+        if catalog.last_error:
+            st.warning(f"Last refresh failed, serving previous snapshot: {catalog.last_error}")
+
+        st.subheader("⏱️ Stage histograms")
+        st.dataframe([{"stage": k, **{m: round(v, 3) for m, v in h.items()}} for k, h in sorted(snap['histograms'].items())], use_container_width=True)
+        st.subheader("🔢 Counters & gauges")
+        st.dataframe([{"name": k, "value": v} for k, v in sorted({**snap['counters'], **snap['gauges']}.items())], use_container_width=True)
+
+        st.download_button("⬇️ metrics.json", json.dumps(snap, indent=2), file_name="metrics.json", mime="application/json")
+        with st.expander("Prometheus text format"):
+            st.code(metrics.REGISTRY.to_prometheus(), language="text")
+    elif ops_password:
+        st.error("❌ Wrong Password")
+
+for tab, render_tab in [(tab1, render_match_tab), (tab2, render_compare_tab), (tab3, render_admin_tab), (tab4, render_ops_tab)]:
+    with tab:
+        if tab_is_open(tab):
+            render_tab()
+
 # --- 6. FOOTER / DISCLOSURE ---
 st.markdown("---")
 st.markdown(
@@ -0,0 +1,234 @@
+"""Offline benchmarks for the enrichment, ranking, compare and card-render paths.
+
+    python bench.py                      # 1k / 100k / 1M rows
+    python bench.py --sizes 1000 50000 --repeat 200 --json out.json
+    python bench.py --imports            # cold import cost per module
+    python bench.py --memory             # bytes per row, plain vs compact catalog
+
+No Streamlit and no network: catalogs come from make_catalog().
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from engine import JUDGES, OS_CHOICES, PERSONAS, WINNER_TABLE_MAX_ROWS, CatalogIndex, ScoreEngine, TopKCache, bytes_per_row, compact, enrich
+from query import QueryIndex, persona_constraints
+from similar import SimilarityIndex
+from budget import BudgetIndex
+from render import alt_card_html, vs_card_html, winner_card_html
+
+BRANDS = [
+    ("Apple iPhone", ["A16 Bionic", "A17 Pro", "A18 Pro"]),
+    ("Samsung Galaxy", ["Snapdragon 8 Gen 3", "Exynos 2400", "Snapdragon 7 Gen 1"]),
+    ("Google Pixel", ["Tensor G3", "Tensor G4"]),
+    ("Xiaomi", ["Snapdragon 8 Gen 2", "Dimensity 8300"]),
+    ("OnePlus", ["Snapdragon 8 Gen 3", "Dimensity 9000"]),
+    ("Motorola Moto", ["Dimensity 7030", "Snapdragon 6 Gen 1"]),
+]
+
+
+def make_catalog(n, seed=0):
+    # Same columns as the published sheet. Price, AnTuTu and camera all follow
+    # one hidden "tier" so the ranking sees realistic correlations.
+    rng = np.random.default_rng(seed)
+    tier = rng.beta(2, 2, n)
+    brand_idx = rng.integers(0, len(BRANDS), n)
+    names = [f"{BRANDS[b][0]} {i}" for i, b in enumerate(brand_idx)]
+    chips = [BRANDS[b][1][i % len(BRANDS[b][1])] for i, b in enumerate(brand_idx)]
+    links = [f"https://www.amazon.com/dp/B0{i:08d}" + ("?th=1" if i % 4 == 0 else "") for i in range(n)]
+    return pd.DataFrame({
+        'name': names,
+        'price': (150 + 1600 * tier + rng.normal(0, 120, n)).clip(80).round().astype(int),
+        'antutu': (2e5 + 2.6e6 * tier + rng.normal(0, 2e5, n)).clip(5e4).round().astype(int),
+        'camera': (5 + 4.8 * tier + rng.normal(0, 0.4, n)).clip(1, 10).round(1),
+        'battery': rng.uniform(6, 10, n).round(1),
+        'chipset': chips,
+        'link': links,
+    })
+
+
+def measure(fn, repeat):
+    # -> (p50 ms, p99 ms, peak traced MB). Peak memory comes from one extra
+    # traced call so tracemalloc's overhead stays out of the timings. numpy
+    # buffers are traced; pyarrow string buffers are not.
+    fn()  # warm-up
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t) * 1000)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return float(np.percentile(times, 50)), float(np.percentile(times, 99)), peak
+
+
+def memory_report(n, seed=0):
+    # -> {column: (bytes/row as enriched, bytes/row after compact())}, plus the
+    # ScoreEngine arrays each layout leads to
+    df = enrich(make_catalog(n, seed))
+    small = compact(df)
+    before, after = bytes_per_row(df), bytes_per_row(small)
+    report = {col: (before.get(col, 0.0), after.get(col, 0.0)) for col in list(df.columns) + ['link_base', 'link_path'] if col != 'link'}
+    report['link'] = (before['link'], after['link_base'] + after['link_path'])
+    del report['link_base'], report['link_path']
+    engines = []
+    for frame in (df, small):
+        engine = ScoreEngine(frame)
+        os_bytes = engine.os_type.nbytes if hasattr(engine.os_type, 'nbytes') else engine.os_type.size * 8
+        engines.append((engine.matrix.nbytes + engine.price.nbytes + os_bytes) / n)
+    report['engine arrays'] = tuple(engines)
+    return report
+
+
+def run(n, repeat, seed=0):
+    raw = make_catalog(n, seed)
+    rng = np.random.default_rng(seed + 1)
+    slow = max(1, repeat // 20)  # whole-catalog stages are too slow for many repeats
+    results = {}
+
+    results['enrich'] = measure(lambda: enrich(raw), slow)
+    # the layout the app and API serve; the plain frame is only for --memory
+    plain = enrich(raw)
+    results['compact'] = measure(lambda: compact(plain), slow)
+    df = compact(plain)
+    engine = ScoreEngine(df)
+    results['engine build'] = measure(lambda: ScoreEngine(df), slow)
+    results['topk cache (15 queries)'] = measure(lambda: TopKCache().refresh(engine, object()), slow)
+
+    queries = [(p, o) for p in PERSONAS for o in OS_CHOICES]
+    def rank_one():
+        p, o = queries[rng.integers(len(queries))]
+        engine.rank(PERSONAS[p][0], 6, engine.persona_mask(p, o))
+    results['rank (persona)'] = measure(rank_one, repeat)
+
+    qi = QueryIndex(engine)
+    results['query index build'] = measure(lambda: QueryIndex(engine), slow)
+    def search_one():
+        p, o = queries[rng.integers(len(queries))]
+        w, ranges, equals = persona_constraints(p, o, max_price=int(rng.integers(300, 1500)), min_cam=float(rng.choice([0, 7, 8])))
+        qi.search(w, 6, ranges, equals)
+    results['search (constraints)'] = measure(search_one, repeat)
+
+    index = CatalogIndex(engine)
+    results['compare index build'] = measure(lambda: CatalogIndex(engine), slow)
+    names = index.models
+    judges = list(JUDGES)
+    def compare_one():
+        a, b = rng.integers(len(names), size=2)
+        index.head_to_head(names[a], names[b], judges[a % len(judges)])
+    results['head-to-head'] = measure(compare_one, repeat)
+    def beaten_one(index):
+        a = rng.integers(len(names))
+        index.beaten_by(names[a], judges[a % len(judges)])
+    results['beaten-by'] = measure(lambda: beaten_one(index), repeat)
+
+    # opt-in packed winner tables, for comparison with the score vectors
+    if n <= WINNER_TABLE_MAX_ROWS:
+        def build_tables():
+            tables = CatalogIndex(engine, winner_tables=True)
+            for judge in judges:
+                tables.table(judge)
+            return tables
+        tables = build_tables()
+        results['winner tables build'] = measure(build_tables, slow)
+        def table_compare_one():
+            a, b = rng.integers(len(names), size=2)
+            tables.head_to_head(names[a], names[b], judges[a % len(judges)])
+        results['head-to-head (table)'] = measure(table_compare_one, repeat)
+        results['beaten-by (table)'] = measure(lambda: beaten_one(tables), repeat)
+
+    sim = SimilarityIndex(engine)
+    results['similar index build'] = measure(lambda: SimilarityIndex(engine), slow)
+    def similar_one():
+        pos = int(rng.integers(n))
+        sim.neighbours(pos, k=5, os_choice=OS_CHOICES[pos % 3], cheaper=bool(pos % 2))
+    results['similar (k=5)'] = measure(similar_one, repeat)
+
+    budgets = BudgetIndex(engine)
+    results['budget index build'] = measure(lambda: BudgetIndex(engine), slow)
+    def budget_one():
+        p, o = queries[rng.integers(len(queries))]
+        budgets.best(o, p, int(rng.integers(100, 2000)))
+    results['budget lookup'] = measure(budget_one, repeat)
+
+    persona = list(PERSONAS)[0]
+    top = engine.rank(PERSONAS[persona][0], 6)
+    rows = [engine.row(p) for p in top]
+    def render_tab1():
+        html = [winner_card_html(rows[0], persona)]
+        html += [alt_card_html(rows[0], row, i) for i, row in enumerate(rows[1:], start=2)]
+        return "".join(html)
+    results['render tab1 cards'] = measure(render_tab1, repeat)
+    results['render vs cards'] = measure(lambda: (vs_card_html(rows[0], rows[1], True, True), vs_card_html(rows[1], rows[0], False, False)), repeat)
+    return results
+
+
+# What a cold Streamlit worker pays before the first script line runs. The app
+# imports the SDK lazily, so google.generativeai is the saving per fresh worker.
+IMPORTS = ['streamlit', 'pandas', 'numpy', 'metrics', 'engine', 'query', 'render', 'catalog', 'snapshot', 'google.generativeai']
+
+
+def import_ms(module):
+    # cumulative self+children time of the top-level import, from -X importtime
+    # in a fresh interpreter; None if the module isn't installed
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True)
+    if proc.returncode:
+        return None
+    for line in reversed(proc.stderr.splitlines()):
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)", line)
+        if m and m.group(3) == module and not m.group(2):
+            return int(m.group(1)) / 1000
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--imports", action="store_true", help="measure cold import time instead")
+    parser.add_argument("--memory", action="store_true", help="report catalog bytes per row instead")
+    args = parser.parse_args()
+
+    report = {}
+    if args.imports:
+        print(f"{'module':<26}{'import ms':>10}")
+        for module in IMPORTS:
+            ms = import_ms(module)
+            report[module] = ms
+            print(f"{module:<26}{'n/a' if ms is None else f'{ms:.1f}':>10}")
+    elif args.memory:
+        for n in args.sizes:
+            print(f"\n== {n:,} rows ==")
+            print(f"{'bytes / row':<26}{'before':>10}{'after':>10}")
+            rows = memory_report(n, args.seed)
+            rows['total'] = tuple(sum(v[i] for v in rows.values()) for i in (0, 1))
+            for col, (before, after) in rows.items():
+                print(f"{col:<26}{before:>10.1f}{after:>10.1f}")
+            report[n] = {col: {'before': before, 'after': after} for col, (before, after) in rows.items()}
+    else:
+        for n in args.sizes:
+            print(f"\n== {n:,} rows ==")
+            print(f"{'stage':<26}{'p50 ms':>10}{'p99 ms':>10}{'peak MB':>10}")
+            results = run(n, args.repeat, args.seed)
+            for stage, (p50, p99, peak) in results.items():
+                print(f"{stage:<26}{p50:>10.3f}{p99:>10.3f}{peak:>10.1f}")
+            report[n] = {stage: {'p50_ms': p50, 'p99_ms': p99, 'peak_mb': peak} for stage, (p50, p99, peak) in results.items()}
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
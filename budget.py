@@ -0,0 +1,57 @@
+import numpy as np
+
+from engine import OS_CHOICES, PERSONAS, _NAN_SCORE
+
+
+class BudgetIndex:
+    # Best phone at every budget, for every persona x OS, built once per data
+    # version from a ScoreEngine. Per query the persona's final_score is swept
+    # over the matching phones in price order; the phones that beat everything
+    # cheaper are the price/score Pareto frontier, and the best phone at or
+    # under any budget is the last frontier phone at or under it, one
+    # searchsorted away. Persona budgets are ignored here (that is the point),
+    # min perf and the OS filter still apply.
+    def __init__(self, engine):
+        self.engine = engine
+        self.fronts = {}
+        order = np.argsort(engine.price, kind='stable')  # same price -> catalog order
+        price = engine.price[order]
+        if len(engine):
+            S = np.stack([PERSONAS[p][0] for p in PERSONAS]).astype(np.float64) @ engine.matrix[order].T
+            S[np.isnan(S)] = _NAN_SCORE
+        for o in OS_CHOICES:
+            for i, p in enumerate(PERSONAS):
+                if not len(engine):
+                    self.fronts[(o, p)] = (np.zeros(0), np.zeros(0, dtype=np.intp), np.zeros(0))
+                    continue
+                rows = np.flatnonzero(engine.mask(o, None, PERSONAS[p][2])[order])
+                s = S[i, rows]
+                # strict record highs of the running max: a later phone with an
+                # equal score is dearer (or same price, later in the catalog)
+                best = np.maximum.accumulate(s)
+                record = np.r_[True, best[1:] > best[:-1]] if len(s) else np.zeros(0, dtype=bool)
+                rows = rows[record]
+                self.fronts[(o, p)] = (price[rows], order[rows], s[record])
+
+    def frontier(self, os_choice, persona):
+        # -> (prices, row positions, final scores), cheapest first; each phone
+        # scores strictly higher than every cheaper phone
+        return self.fronts[(os_choice, persona)]
+
+    def best(self, os_choice, persona, budget):
+        # -> row position of the best phone at or under budget, or None
+        prices, positions, _ = self.fronts[(os_choice, persona)]
+        i = np.searchsorted(prices, budget, side='right') - 1
+        return int(positions[i]) if i >= 0 else None
+
+    def steps(self, os_choice, persona, step=100, upto=None):
+        # -> (budgets, row positions, scores) at every `step` dollars up to
+        # `upto` (default: the dearest frontier phone); -1 = nothing affordable
+        prices, positions, scores = self.fronts[(os_choice, persona)]
+        if not len(prices):
+            return np.zeros(0), np.zeros(0, dtype=np.intp), np.zeros(0)
+        upto = prices[-1] if upto is None else upto
+        budgets = np.arange(step, upto + step, step, dtype=np.float64)
+        i = np.searchsorted(prices, budgets, side='right') - 1
+        ok = i >= 0
+        return budgets, np.where(ok, positions[i], -1), np.where(ok, scores[i], np.nan)
@@ -0,0 +1,200 @@
+import hashlib
+import io
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from engine import NORMALIZED, catalog_maxima, compact, data_version, enrich_rows, score_column
+from snapshot import read_snapshot, write_snapshot
+
+SHEET_URL = os.environ.get("TECHCHOOSE_SHEET_URL", "https://docs.google.com/spreadsheets/d/e/2PACX-1vQqoziKy640ID3oDos-DKk49txgsNPdMJGb_vAH1_WiRG88kewDPneVgo9iSHq2u5DXYI_g_n6se14k/pub?output=csv")
+SCORE_SOURCES = {**NORMALIZED, 'value': 'price'}
+
+
+class CatalogRefresher:
+    # Keeps the last good enriched snapshot of the sheet and refreshes it in place:
+    # conditional GET (ETag / Last-Modified), body hash, then per-row hashes so only
+    # new or edited rows go through enrich_rows(). Score columns are rebuilt for
+    # every row only when the maximum they are normalized against moves.
+    # With snapshot_dir set, a new process starts from the on-disk snapshot and
+    # refreshes in a background thread; each new version is written back to disk.
+    def __init__(self, url, ttl=60, timeout=10, snapshot_dir=None):
+        self.url = url
+        self.ttl = ttl
+        self.timeout = timeout
+        self.snapshot_dir = snapshot_dir
+        empty = pd.DataFrame()
+        self._current = (empty, data_version(empty), None)
+        self.fetched_at = 0.0
+        self.last_error = None
+        self._etag = None
+        self._last_modified = None
+        self._body_hash = None
+        self._derived = None  # derived columns indexed by raw row hash
+        self._maxima = None
+        self._columns = None
+        self._lock = threading.Lock()
+        if snapshot_dir:
+            snap = read_snapshot(snapshot_dir)
+            if snap is not None:
+                self._current = snap
+
+    @property
+    def df(self):
+        return self._current[0]
+
+    @property
+    def version(self):
+        return self._current[1]
+
+    @property
+    def matrix(self):
+        # score matrix mapped from the snapshot, None when serving a private
+        # in-memory frame (no snapshot_dir, or the snapshot write failed)
+        return self._current[2]
+
+    def current(self):
+        return self._current
+
+    def maybe_refresh(self):
+        if time.time() - self.fetched_at < self.ttl:
+            metrics.inc('data_cache_hit')
+            return False
+        metrics.inc('data_cache_miss')
+        # only block when there is nothing to serve yet; otherwise the fetch runs
+        # in the background (or is already running in another session)
+        if self.df.empty:
+            with self._lock:
+                if time.time() - self.fetched_at < self.ttl:
+                    return False
+                return self._refresh()
+        if self._lock.acquire(blocking=False):
+            threading.Thread(target=self._refresh_locked, daemon=True).start()
+        return False
+
+    def _refresh_locked(self):
+        try:
+            self._refresh()
+        finally:
+            self._lock.release()
+
+    def refresh(self):
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self):
+        # Any failure keeps the last good snapshot instead of blanking the site
+        self.fetched_at = time.time()
+        try:
+            with metrics.span('fetch'):
+                fetched = self._fetch()
+            if fetched is None:
+                metrics.inc('fetch_not_modified')
+                self.last_error = None
+                return False
+            body, validators = fetched
+            metrics.observe('fetch_bytes', len(body))
+            body_hash = hashlib.sha256(body).hexdigest()
+            if body_hash == self._body_hash:
+                metrics.inc('fetch_unchanged')
+                self.last_error = None
+                self._etag, self._last_modified = validators
+                return False
+            with metrics.span('parse'):
+                raw = pd.read_csv(io.BytesIO(body))
+            with metrics.span('enrich'):
+                df = compact(self._apply(raw))
+            if df.empty:
+                raise ValueError("sheet returned no rows")
+        except Exception as e:
+            metrics.inc('fetch_error')
+            self.last_error = f"{type(e).__name__}: {e}"
+            return False
+
+        # validators are only remembered for a body that made it this far;
+        # keeping a bad body's ETag would turn every later poll into a 304
+        # and hide the failure until the sheet changes again
+        self.last_error = None
+        self._body_hash = body_hash
+        self._etag, self._last_modified = validators
+        version = data_version(df)
+        if version == self.version:
+            return False
+        current = (df, version, None)
+        if self.snapshot_dir:
+            # serve the published, memory-mapped copy so every worker shares
+            # its pages; the private frame is only kept if publishing fails
+            try:
+                write_snapshot(df, version, self.snapshot_dir)
+                snap = read_snapshot(self.snapshot_dir)
+                if snap is not None and snap[1] == version:
+                    current = snap
+            except OSError as e:
+                self.last_error = f"snapshot: {e}"
+        self._current = current
+        metrics.inc('catalog_updates')
+        metrics.gauge('catalog_rows', len(df))
+        return True
+
+    def _fetch(self):
+        # -> (body, (etag, last_modified)), or None for "not modified"
+        req = urllib.request.Request(self.url)
+        if self._etag: req.add_header('If-None-Match', self._etag)
+        if self._last_modified: req.add_header('If-Modified-Since', self._last_modified)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                body = resp.read()
+                validators = (resp.headers.get('ETag'), resp.headers.get('Last-Modified'))
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None
+            raise
+        return body, validators
+
+    def _apply(self, raw):
+        if raw.empty:
+            return raw
+        raw = raw.dropna(subset=['name', 'price']).reset_index(drop=True)
+        keys = pd.Index(pd.util.hash_pandas_object(raw, index=False).to_numpy())
+        maxima = catalog_maxima(raw)
+
+        prev = self._derived
+        if prev is None or self._columns != list(raw.columns):
+            prev = None  # first load or sheet layout changed: nothing to reuse
+            known = np.zeros(len(raw), dtype=bool)
+        else:
+            known = keys.isin(prev.index)
+
+        new_rows = raw[~known & ~keys.duplicated()]
+        metrics.observe('enrich_rows', len(new_rows))
+        fresh = enrich_rows(new_rows)
+        row_cols = [col for col in fresh.columns if col not in raw.columns] + ['link']
+        fresh = fresh[row_cols]
+        for col in SCORE_SOURCES:
+            fresh[col] = score_column(new_rows, col, maxima)
+        fresh.index = keys[new_rows.index]
+        derived = fresh if prev is None else pd.concat([prev[prev.index.isin(keys)], fresh])
+
+        # a moved maximum invalidates that score column for every row
+        unique = ~keys.duplicated()
+        for col, src in SCORE_SOURCES.items():
+            if self._maxima is not None and maxima[src] != self._maxima[src]:
+                rebuilt = score_column(raw[unique], col, maxima)
+                rebuilt.index = keys[unique]
+                derived[col] = rebuilt
+
+        self._derived, self._maxima, self._columns = derived, maxima, list(raw.columns)
+
+        out = raw.copy()
+        rows = derived.loc[keys]
+        out['link'] = rows['link'].to_numpy()
+        for col in derived.columns.drop('link'):
+            out[col] = rows[col].to_numpy()
+        if 'antutu' not in out.columns: out['antutu'] = out['price'] * 2000
+        return out
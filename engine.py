@@ -0,0 +1,386 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# --- SCORING MODEL ---
+# Column order of the score matrix. Every weight vector below uses the same order.
+SCORE_COLS = ['perf_score', 'cam_score', 'batt_score', 'value', 'brand_score']
+
+OS_CHOICES = ["Any", "iOS", "Android"]
+
+# persona -> (weights p,c,b,v,br, budget, min perf_score)
+PERSONAS = {
+    "💎 Ultimate High-End": ((10, 10, 10, 0, 5), 9999, None),
+    "🏠 General Use": ((6, 6, 6, 12, 3), 1500, None),
+    "🎮 Gamer": ((25, 3, 10, 5, 2), 2000, None),
+    "📸 Creator": ((6, 25, 7, 3, 4), 2000, None),
+    "💰 Student (Best Value)": ((7, 6, 8, 15, 2), 900, 4.0),
+}
+
+# judge mode -> weights p,c,b,v,br
+JUDGES = {
+    "💎 Overall Specs": (1, 1, 1, 1, 1),
+    "🎮 Gaming Performance": (10, 0, 3, 1, 1),
+    "📸 Camera Quality": (2, 10, 3, 1, 1),
+}
+
+# NaN scores still rank, just below every real score (same as sort_values)
+_NAN_SCORE = -np.finfo(np.float64).max
+
+
+# raw column each normalized score is built from; missing column -> flat 5.0
+NORMALIZED = {
+    'perf_score': 'antutu',
+    'cam_score': 'camera',
+    'batt_score': 'battery',
+}
+MAXIMA_DEFAULTS = {'antutu': 1, 'camera': 10, 'battery': 10, 'price': 2000}
+AFFILIATE_TAG = "techchoose-20"
+
+# name/chipset classifiers live in rules.json so a new brand is a data edit
+RULES_PATH = os.environ.get("TECHCHOOSE_RULES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json"))
+_rules = None
+
+
+def compile_rules(spec):
+    # tag -> (source column, one regex per rule, values, default). Rules are
+    # checked in order and the first hit wins, same as the old if-chains.
+    compiled = {}
+    for tag, t in spec.items():
+        patterns = ["|".join(f"(?:{m})" for m in r['match']) for r in t['rules']]
+        values = [r['value'] for r in t['rules']]
+        compiled[tag] = (t['source'], patterns, values, t['default'])
+    return compiled
+
+
+def load_rules(path=None):
+    global _rules
+    if path is None and _rules is not None:
+        return _rules
+    with open(path or RULES_PATH, encoding="utf-8") as f:
+        compiled = compile_rules(json.load(f))
+    if path is None:
+        _rules = compiled
+    return compiled
+
+
+def apply_rule(series, patterns, values, default):
+    # One vectorized str.contains per rule (Arrow regex kernels on pandas'
+    # string dtype), then the first matching rule per row picks the value.
+    s = series.astype(str)
+    codes = None
+    # low-cardinality columns (chipset) are matched once per distinct value
+    if len(s) > 1000 and s.iloc[:1000].nunique() < 500:
+        codes, uniques = pd.factorize(s)
+        s = pd.Series(uniques, dtype=s.dtype)
+    choices = np.array(values + [default], dtype=object if isinstance(default, str) else None)
+    hits = np.zeros((len(s), len(patterns) + 1), dtype=bool)
+    for i, pattern in enumerate(patterns):
+        hits[:, i] = s.str.contains(pattern, case=False, regex=True, na=False).to_numpy()
+    hits[:, -1] = True
+    out = choices[hits.argmax(axis=1)]
+    return out if codes is None else np.where(codes >= 0, out[codes], default)
+
+
+def tag_links(links, tag=AFFILIATE_TAG):
+    s = links.astype(str)
+    # Only links that already carry a tag= or a #fragment need real URL surgery
+    messy = s.str.contains(r"[?&]tag=|#", regex=True, na=False).to_numpy()
+    if messy.any():
+        parts = s[messy].str.extract(r"(?s)^(?P<base>[^#]*)(?P<frag>#.*)?$")
+        base = parts['base'].str.replace(r"(?<=[?&])tag=[^&]*(?:&|$)", "", regex=True).str.replace(r"[?&]$", "", regex=True)
+        sep = np.where(base.str.contains("?", regex=False), "&", "?")
+        s[messy] = base + sep + f"tag={tag}" + parts['frag'].fillna("")
+    clean = ~messy
+    sep = np.where(s[clean].str.contains("?", regex=False), "&", "?")
+    s[clean] = s[clean] + sep + f"tag={tag}"
+    return s
+
+
+def enrich_rows(df, rules=None):
+    # Row-local derived columns: each only depends on its own row
+    df = df.copy()
+    for tag, (source, patterns, values, default) in (rules or load_rules()).items():
+        src = df[source] if source in df.columns else pd.Series("", index=df.index)
+        df[tag] = apply_rule(src, patterns, values, default)
+    df['link'] = tag_links(df['link'])
+    return df
+
+
+def catalog_maxima(df):
+    return {col: (df[col].max() if col in df.columns else default) for col, default in MAXIMA_DEFAULTS.items()}
+
+
+def score_column(df, col, maxima):
+    # Columns that depend on a catalog-wide maximum
+    if col == 'value':
+        max_price = maxima['price']
+        # Dynamic Value Score
+        if max_price > 0:
+            return (10 * (1 - (df['price'] / max_price)) + 1).clip(0, 10)
+        return pd.Series(5.0, index=df.index)
+    src = NORMALIZED[col]
+    if src in df.columns:
+        return (df[src] / maxima[src]) * 10
+    return pd.Series(5.0, index=df.index)
+
+
+def enrich(df):
+    if df.empty:
+        return df
+    df = enrich_rows(df.dropna(subset=['name', 'price']))
+    maxima = catalog_maxima(df)
+    for col in list(NORMALIZED) + ['value']:
+        df[col] = score_column(df, col, maxima)
+    if 'antutu' not in df.columns: df['antutu'] = df['price'] * 2000
+    return df.reset_index(drop=True)
+
+
+# --- COMPACT LAYOUT ---
+# Low-cardinality tags are stored as categoricals (1-2 byte codes + one copy of
+# each label), measured floats as float32, integer columns as int32, and every
+# link as (shared base, per-row path); ScoreEngine.row() joins the link back.
+# Float prices stay float64 so "$1,299.99" still formats exactly.
+CATEGORY_COLS = ['os_type', 'brand', 'chip_family', 'chipset']
+STRING_DTYPE = pd.StringDtype("pyarrow")
+LINK_COLS = ['link_base', 'link_path']
+
+
+def compact(df):
+    if df.empty:
+        return df
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if col in CATEGORY_COLS:
+            s = s.astype('category')
+        elif col == 'link':
+            # "https://www.amazon.com/dp/B0..?tag=.." -> "https://www.amazon.com/dp/", "B0..?tag=.."
+            parts = s.astype(STRING_DTYPE).str.rpartition('/')
+            out['link_base'] = (parts[0] + parts[1]).astype('category')
+            out['link_path'] = parts[2]
+            continue
+        elif pd.api.types.is_float_dtype(s) and col != 'price':
+            s = s.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(s) and s.abs().max() < 2**31:
+            s = s.astype(np.int32)  # not narrower: price differences would overflow int16
+        elif not pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            s = s.astype(STRING_DTYPE)
+        out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def bytes_per_row(df):
+    # deep memory of each column / rows, including category labels and string buffers
+    n = max(len(df), 1)
+    return (df.memory_usage(deep=True, index=False) / n).to_dict()
+
+
+def data_version(df):
+    # Content hash of the enriched frame; changes whenever the catalog does
+    if df.empty:
+        return "empty"
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.blake2b(row_hashes.tobytes(), digest_size=8).hexdigest()
+
+
+def find_persona(label):
+    # Same substring rules Tab 1 always used ("Gamer" in lifestyle, ...)
+    for key in ("High-End", "Gamer", "Creator", "Student"):
+        if key in label:
+            return next(p for p in PERSONAS if key in p)
+    return "🏠 General Use"
+
+
+def find_judge(label):
+    # "camera", "Gaming Performance" or the full label; unknown -> Overall Specs
+    label = (label or "").lower()
+    return next((j for j in JUDGES if label and label in j.lower()), next(iter(JUDGES)))
+
+
+# --- RANKING ENGINE ---
+class ScoreEngine:
+    def __init__(self, df, matrix=None):
+        # matrix: optional precomputed df[SCORE_COLS] (e.g. memory-mapped snapshot)
+        self.df = df.reset_index(drop=True)
+        self._values = {col: self.df[col].array for col in self.df.columns}
+        n = len(self.df)
+        if n:
+            if matrix is None:
+                matrix = self.df[SCORE_COLS].to_numpy(dtype=np.float64)
+            self.matrix = np.ascontiguousarray(matrix)
+            self.price = self.df['price'].to_numpy(dtype=np.float64)
+            # categorical: OS filters compare 1-byte codes, not Python strings
+            self.os_type = self.df['os_type'].astype('category').array
+        else:
+            self.matrix = np.zeros((0, len(SCORE_COLS)))
+            self.price = np.zeros(0)
+            self.os_type = np.zeros(0, dtype=object)
+
+    def __len__(self):
+        return len(self.df)
+
+    def row(self, pos):
+        # one phone as {column: scalar}, with the split link (see compact())
+        # joined back; reads the column arrays directly, no Series per card
+        row = {col: values[pos] for col, values in self._values.items()}
+        if 'link_path' in row:
+            base, path = row.pop('link_base'), row.pop('link_path')
+            row['link'] = ("" if pd.isna(base) else base) + ("" if pd.isna(path) else path)
+        return row
+
+    def mask(self, os_choice="Any", budget=None, min_perf=None):
+        m = np.ones(len(self), dtype=bool)
+        if "iOS" in os_choice: m &= self.os_type == 'iOS'
+        elif "Android" in os_choice: m &= self.os_type == 'Android'
+        if min_perf is not None: m &= self.matrix[:, 0] >= min_perf
+        if budget is not None: m &= self.price <= budget
+        return m
+
+    def persona_mask(self, persona, os_choice="Any"):
+        _, budget, min_perf = PERSONAS[persona]
+        return self.mask(os_choice, budget, min_perf)
+
+    def scores(self, weights):
+        return self.matrix @ np.asarray(weights, dtype=np.float64)
+
+    def rank(self, weights, k=6, mask=None):
+        masks = None if mask is None else np.asarray(mask)[None, :]
+        return self.rank_batch([weights], k, masks)[0]
+
+    def rank_batch(self, weights, k=6, masks=None):
+        # One (q x 5) @ (5 x n) product scores every query, then a partition
+        # picks each row's top-k without sorting the whole catalog.
+        W = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+        n = len(self)
+        if n == 0 or k <= 0:
+            return [np.zeros(0, dtype=np.intp) for _ in range(len(W))]
+
+        S = W @ self.matrix.T
+        S[np.isnan(S)] = _NAN_SCORE
+        if masks is not None:
+            S[~np.broadcast_to(masks, S.shape)] = -np.inf
+
+        results = []
+        for row in S:
+            top = top_k(row, k)
+            results.append(top[row[top] > -np.inf])
+        return results
+
+
+def top_k(s, k):
+    # Indices of the k largest values of s, best first. argpartition alone
+    # picks arbitrarily among ties at the cut, so ties are resolved by index.
+    n = len(s)
+    if k >= n:
+        return np.argsort(-s, kind='stable')
+    kth = np.partition(s, n - k)[n - k]
+    above = np.flatnonzero(s > kth)
+    idx = np.concatenate([above, np.flatnonzero(s == kth)[:k - len(above)]])
+    idx.sort()
+    return idx[np.argsort(-s[idx], kind='stable')]
+
+
+# --- RESULT CACHE ---
+class TopKCache:
+    # Only OS_CHOICES x PERSONAS (15) queries exist in Tab 1, so all of them are
+    # ranked in one batch per data version and served as dict lookups.
+    def __init__(self, k=6):
+        self.k = k
+        self._state = (None, {})
+
+    @property
+    def version(self):
+        return self._state[0]
+
+    def refresh(self, engine, version):
+        if version == self.version:
+            return
+        queries = [(o, p) for o in OS_CHOICES for p in PERSONAS]
+        weights = [PERSONAS[p][0] for _, p in queries]
+        masks = np.stack([engine.persona_mask(p, o) for o, p in queries]) if len(engine) else None
+        results = engine.rank_batch(weights, self.k, masks)
+        # swap version and entries together so readers never see a mix
+        self._state = (version, dict(zip(queries, results)))
+
+    def get(self, version, os_choice, persona):
+        # None unless the entries were ranked for this data version: the cache
+        # is shared, and another session may have refreshed it for a newer (or
+        # older) catalog than the caller's engine
+        cached, entries = self._state
+        return entries.get((os_choice, persona)) if cached == version else None
+
+
+# --- COMPARE INDEX ---
+WINNER_TABLE_MAX_ROWS = 20000  # n^2 bits per judge: 20k models -> 50 MB per judge
+_TABLE_BLOCK = 1024
+
+
+class WinnerTable:
+    # bits[i] packs, for every j, whether phone i beats phone j when picked as
+    # Phone A (score_i >= score_j, the Tab 2 tie rule)
+    def __init__(self, scores):
+        n = len(scores)
+        self.bits = np.zeros((n, (n + 7) // 8), dtype=np.uint8)
+        for start in range(0, n, _TABLE_BLOCK):
+            block = scores[start:start + _TABLE_BLOCK, None] >= scores[None, :]
+            self.bits[start:start + _TABLE_BLOCK] = np.packbits(block, axis=1)
+        self.n = n
+        self.valid = ~np.isnan(scores)
+
+    def beats(self, i, j):
+        return bool((self.bits[i, j >> 3] >> (7 - (j & 7))) & 1)
+
+    def beaten_by(self, i):
+        wins = np.unpackbits(self.bits[i], count=self.n).astype(bool)
+        return np.flatnonzero(~wins & self.valid)
+
+
+class CatalogIndex:
+    # Built once per data version: name -> row position, the sorted model list
+    # for the Tab 2 selectboxes, and one score vector per judge. A duel is two
+    # float reads from those vectors. Packed winner tables are opt-in only:
+    # they cost n^2/8 bytes per judge and are no faster than the vectors
+    # (beats() is O(1) either way, beaten_by() is O(n) either way).
+    def __init__(self, engine, winner_tables=False):
+        self.engine = engine
+        names = engine.df['name'] if len(engine) else pd.Series([], dtype=object)
+        first = ~names.duplicated()
+        # first row wins on duplicate names, like df[df['name'] == x].iloc[0]
+        self.positions = dict(zip(names[first].tolist(), np.flatnonzero(first.to_numpy()).tolist()))
+        self.models = sorted(self.positions)
+        self.judge_scores = {j: engine.scores(w) for j, w in JUDGES.items()}
+        self.winner_tables = winner_tables and len(engine) <= WINNER_TABLE_MAX_ROWS
+        self._tables = {}
+
+    def row(self, name):
+        return self.engine.row(self.positions[name])
+
+    def table(self, judge):
+        if not self.winner_tables:
+            return None
+        if judge not in self._tables:
+            self._tables[judge] = WinnerTable(self.judge_scores[judge])
+        return self._tables[judge]
+
+    def head_to_head(self, name_a, name_b, judge):
+        # True when Phone A wins
+        i, j = self.positions[name_a], self.positions[name_b]
+        table = self.table(judge)
+        if table is not None:
+            return table.beats(i, j)
+        s = self.judge_scores[judge]
+        return bool(s[i] >= s[j])
+
+    def beaten_by(self, name, judge):
+        # row positions of every phone that beats `name` under this judge
+        i = self.positions[name]
+        table = self.table(judge)
+        if table is not None:
+            return table.beaten_by(i)
+        s = self.judge_scores[judge]
+        # a NaN score never beats anyone; every real score beats a NaN one
+        return np.flatnonzero(~(s[i] >= s) & ~np.isnan(s))
@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (ms for spans, raw units for other histograms); the last bucket is +inf
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 1e5, 1e6, 1e7)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, c in zip(self.buckets, self.counts):
+            seen += c
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'max': self.max,
+        }
+
+
+class Registry:
+    # In-process counters / gauges / histograms shared by every session
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def inc(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name, value):
+        with self._lock:
+            h = self.histograms.get(name)
+            if h is None:
+                h = self.histograms[name] = Histogram()
+            h.observe(value)
+
+    @contextmanager
+    def span(self, name):
+        # times the block into the "<name>_ms" histogram
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(f"{name}_ms", (time.perf_counter() - t) * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'uptime_s': time.time() - self.started,
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'histograms': {k: h.summary() for k, h in self.histograms.items()},
+            }
+
+    def to_prometheus(self, prefix="techchoose"):
+        lines = []
+        with self._lock:
+            for k, v in sorted(self.counters.items()):
+                lines += [f"# TYPE {prefix}_{k}_total counter", f"{prefix}_{k}_total {v}"]
+            for k, v in sorted(self.gauges.items()):
+                lines += [f"# TYPE {prefix}_{k} gauge", f"{prefix}_{k} {v}"]
+            for k, h in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {prefix}_{k} histogram")
+                cumulative = 0
+                for bound, c in zip(h.buckets, h.counts):
+                    cumulative += c
+                    lines.append(f'{prefix}_{k}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_{k}_bucket{{le="+Inf"}} {h.count}')
+                lines += [f"{prefix}_{k}_sum {h.sum}", f"{prefix}_{k}_count {h.count}"]
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        # atomic JSON dump, for scrapers that read a file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def start_dump_thread(self, path, interval=15):
+        def loop():
+            while True:
+                try:
+                    self.dump(path)
+                except OSError:
+                    pass
+                time.sleep(interval)
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+
+REGISTRY = Registry()
+inc = REGISTRY.inc
+gauge = REGISTRY.set
+observe = REGISTRY.observe
+span = REGISTRY.span
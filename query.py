@@ -0,0 +1,152 @@
+import numpy as np
+
+import metrics
+from engine import PERSONAS, SCORE_COLS, _NAN_SCORE, top_k
+
+RANGE_COLS = ['price'] + SCORE_COLS
+EQUALITY_COLS = ['os_type', 'brand', 'chip_family', 'chipset']
+
+
+class QueryIndex:
+    # Built once per data version from a ScoreEngine:
+    #  - sorted index per numeric column: range constraints become searchsorted
+    #    slices instead of full-column comparisons
+    #  - packed bitmap per distinct value of the categorical columns: equality
+    #    constraints are ANDed n/8 bytes at a time
+    # search() then walks the score columns best-first (Fagin's threshold
+    # algorithm) and stops once no unseen phone can enter the top-k.
+    def __init__(self, engine):
+        self.engine = engine
+        self.n = len(engine)
+        df = engine.df
+        self.sorted = {}
+        for col in RANGE_COLS:
+            if col in df.columns:
+                vals = engine.price if col == 'price' else engine.matrix[:, SCORE_COLS.index(col)]
+                filled = np.where(np.isnan(vals), -np.inf, vals)
+                order = np.argsort(filled, kind='stable')
+                self.sorted[col] = (filled[order], order)
+        self.bitmaps = {}
+        for col in EQUALITY_COLS:
+            if col in df.columns:
+                codes, uniques = df[col].factorize()
+                self.bitmaps[col] = {v: np.packbits(codes == i) for i, v in enumerate(uniques)}
+
+    def values(self, col):
+        return sorted(self.bitmaps.get(col, {}), key=str)
+
+    def candidates(self, ranges=None, equals=None):
+        # ranges: {col: (lo, hi)} inclusive, either end may be None
+        # equals: {col: value or list of values}
+        bits = np.full((self.n + 7) // 8, 0xFF, dtype=np.uint8)
+        for col, allowed in (equals or {}).items():
+            if allowed is None:
+                continue
+            if not isinstance(allowed, (list, tuple, set)):
+                allowed = [allowed]
+            index = self.bitmaps.get(col, {})
+            any_of = np.zeros_like(bits)
+            for v in allowed:
+                if v in index:
+                    any_of |= index[v]
+            bits &= any_of
+        for col, (lo, hi) in (ranges or {}).items():
+            if lo is None and hi is None:
+                continue
+            vals, order = self.sorted[col]
+            start = 0 if lo is None else np.searchsorted(vals, lo, side='left')
+            stop = len(vals) if hi is None else np.searchsorted(vals, hi, side='right')
+            in_range = np.zeros(self.n, dtype=bool)
+            in_range[order[start:stop]] = True
+            bits &= np.packbits(in_range)
+        return np.unpackbits(bits, count=self.n).astype(bool)
+
+    def search(self, weights, k=6, ranges=None, equals=None, block=256):
+        # -> row positions of the top-k matching phones, best first, ties in
+        # catalog order (same result as ScoreEngine.rank with the same mask)
+        w = np.asarray(weights, dtype=np.float64)
+        if self.n == 0 or k <= 0:
+            return np.zeros(0, dtype=np.intp)
+        mask = self.candidates(ranges, equals)
+        total = int(mask.sum())
+        # selective filters: scoring just the candidates is cheaper than walking
+        if total <= max(4 * block, self.n // 8):
+            metrics.observe('rows_scored', total)
+            return self._best(np.flatnonzero(mask), w, k)
+
+        # each weighted column is read from its best end; w < 0 reads ascending
+        walks = []
+        for i, wi in enumerate(w):
+            if wi == 0:
+                continue
+            vals, order = self.sorted[SCORE_COLS[i]]
+            walks.append((wi, vals, order) if wi < 0 else (wi, vals[::-1], order[::-1]))
+        if not walks:
+            # every score ties, but a NaN one still sorts last (nan * 0 is nan)
+            metrics.observe('rows_scored', total)
+            return self._best(np.flatnonzero(mask), w, k)
+
+        seen = ~mask  # rows outside the constraints count as already seen
+        pool = np.zeros(0, dtype=np.intp)
+        depth = 0
+        while depth < self.n // 16:
+            # read deeper each round so the number of numpy round-trips stays
+            # logarithmic in the depth reached
+            step = slice(depth, depth + block)
+            batch = np.concatenate([order[step] for _, _, order in walks])
+            batch = batch[~seen[batch]]
+            batch.sort()
+            batch = batch[np.r_[True, batch[1:] != batch[:-1]]] if len(batch) else batch
+            seen[batch] = True
+            pool = self._best(np.concatenate([pool, batch]), w, k)
+            depth += block
+            block *= 2
+            # best score any unseen row could still reach
+            bound = sum(wi * vals[depth - 1] for wi, vals, _ in walks)
+            if len(pool) == k and self._score(pool[-1:], w)[0] > bound:
+                metrics.observe('rows_scored', int(seen.sum()) - (self.n - total))
+                return pool
+        # weights spread over anti-correlated columns never tighten the bound;
+        # past 1/16 of the catalog one dense pass over the candidates is cheaper
+        metrics.observe('rows_scored', self.n)
+        return self.engine.rank(w, k, mask)
+
+    def _score(self, rows, w):
+        s = self.engine.matrix[rows] @ w
+        s[np.isnan(s)] = _NAN_SCORE
+        return s
+
+    def _best(self, rows, w, k):
+        rows = np.sort(rows)  # ties keep catalog order
+        return rows[top_k(self._score(rows, w), k)]
+
+
+def persona_constraints(persona, os_choice="Any", max_price=None, min_cam=None, chip_family=None):
+    # The Tab 1 controls as search() arguments: persona budget / min perf,
+    # the OS picker and the optional advanced filters. An explicit max_price
+    # replaces the persona budget (a Student may look up to $1,200).
+    weights, budget, min_perf = PERSONAS[persona]
+    if max_price:
+        budget = max_price
+    ranges = {'price': (None, budget)}
+    if min_perf is not None: ranges['perf_score'] = (min_perf, None)
+    if min_cam: ranges['cam_score'] = (min_cam, None)
+    equals = {}
+    if "iOS" in os_choice: equals['os_type'] = 'iOS'
+    elif "Android" in os_choice: equals['os_type'] = 'Android'
+    if chip_family and chip_family != "Any": equals['chip_family'] = chip_family
+    return weights, ranges, equals
+
+
+def best_match(topk_cache, query_index, version, persona, os_choice="Any", max_price=None, min_cam=None, chip_family=None, k=6):
+    # Tab 1's ranking: the default filters are one of the 15 precomputed
+    # queries, anything else (or a cache holding another version) goes
+    # through search()
+    top = None
+    if not max_price and not min_cam and (not chip_family or chip_family == "Any") and k == topk_cache.k:
+        top = topk_cache.get(version, os_choice, persona)
+    metrics.inc('topk_cache_hit' if top is not None else 'topk_cache_miss')
+    if top is None:
+        weights, ranges, equals = persona_constraints(persona, os_choice, max_price, min_cam, chip_family)
+        top = query_index.search(weights, k=k, ranges=ranges, equals=equals)
+    return top
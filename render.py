@@ -0,0 +1,135 @@
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# --- CARD HTML ---
+# Pure string builders (no Streamlit) so cards can be cached and benchmarked.
+
+def get_dynamic_badge(mode, price):
+    if "High-End" in mode: return "💎 MARKET LEADER"
+    elif "Gamer" in mode: return "🏆 GAMING BEAST"
+    elif "Creator" in mode: return "🎥 CREATOR CHOICE"
+    elif "Student" in mode: return "💰 SMART CHOICE"
+    else: return "⭐ BEST OVERALL"
+
+def stat_bar_html(label, score, color):
+    width = min(score * 10, 100)
+    return f"<div style='background:#151515;padding:8px;border-radius:8px;text-align:center;border:1px solid #333;margin-bottom:5px;'><div style='color:#888 !important;font-size:0.65em;font-weight:700;margin-bottom:4px;'>{label}</div><div style='font-size:1.1em;font-weight:900;color:white !important;'>{score:.1f}</div><div style='background:#333;height:4px;border-radius:2px;margin-top:4px;overflow:hidden;'><div style='width:{width}%;height:100%;background:{color};'></div></div></div>"
+
+def get_reason_badge_html(winner_row, current_row):
+    badges = ""
+    diff = winner_row['price'] - current_row['price']
+    if diff >= 50:
+        badges += f"<span style='background:rgba(16,185,129,0.2);color:#10B981 !important;border:1px solid #10B981;padding:2px 6px;border-radius:4px;font-size:0.7em;font-weight:bold;margin-left:8px;'>SAVE ${int(diff):,}</span>"
+    if current_row['perf_score'] > (winner_row['perf_score'] + 0.3):
+        badges += "<span style='background:rgba(59,130,246,0.2);color:#3B82F6 !important;border:1px solid #3B82F6;padding:2px 6px;border-radius:4px;font-size:0.7em;font-weight:bold;margin-left:8px;'>🚀 FASTER</span>"
+    return badges
+
+def get_score_badge_html(icon, label, score):
+    if score >= 9.5: c, b = "#10B981", "rgba(16,185,129,0.4)"
+    elif score >= 8.5: c, b = "#3B82F6", "rgba(59,130,246,0.4)"
+    else: c, b = "#F59E0B", "rgba(245,158,11,0.4)"
+    return f"<div style='display:inline-flex;align-items:center;background:rgba(0,0,0,0.5);border:1px solid {b};border-radius:6px;padding:3px 8px;margin-right:6px;'><span style='font-size:1em;margin-right:4px;'>{icon}</span><span style='color:#888 !important;font-size:0.6em;font-weight:700;margin-right:4px;text-transform:uppercase;'>{label}</span><span style='color:{c} !important;font-weight:900;font-family:monospace;font-size:0.9em;'>{score:.1f}</span></div>"
+
+def winner_card_html(winner, lifestyle):
+    s1 = stat_bar_html('🚀 SPEED', winner['perf_score'], '#3B82F6')
+    s2 = stat_bar_html('📸 CAM', winner['cam_score'], '#A855F7')
+    s3 = stat_bar_html('🔋 BATT', winner['batt_score'], '#10B981')
+    stats = f"<div style='display:grid;grid-template-columns:1fr 1fr 1fr;gap:10px;margin:20px 0;'>{s1}{s2}{s3}</div>"
+    return (
+        f"<div class='winner-box'>"
+        f"<div style='background:#F59E0B;color:black !important;padding:5px 15px;border-radius:20px;display:inline-block;font-weight:900;font-size:0.8em;margin-bottom:10px;'>{get_dynamic_badge(lifestyle, winner['price'])}</div>"
+        f"<div class='hero-title'>{winner['name']}</div>"
+        f"<div class='hero-price'>${winner['price']:,}</div>"
+        f"{stats}"
+        f"<a href='{winner['link']}' target='_blank' class='amazon-btn'>👉 VIEW DEAL</a>"
+        f"</div>"
+    )
+
+def alt_card_html(winner, row, rank_num, mark=None):
+    # mark replaces the rank number in the box (similar-phone cards use "≈")
+    rank_col = "#E0E0E0" if rank_num == 2 else "#E6AC75" if rank_num == 3 else "#333"
+    badges = get_reason_badge_html(winner, row)
+    scores = f"{get_score_badge_html('🚀','Speed',row['perf_score'])}{get_score_badge_html('📸','Cam',row['cam_score'])}{get_score_badge_html('🔋','Batt',row['batt_score'])}"
+    return (
+        f"<a href='{row['link']}' target='_blank' class='alt-link'>"
+        f"<div class='alt-card'>"
+        f"<div style='display:flex;align-items:center;'>"
+        f"<div style='width:35px;height:35px;background:{rank_col};color:{'black' if rank_num<4 else '#888'} !important;display:flex;align-items:center;justify-content:center;font-weight:900;border-radius:8px;margin-right:15px;font-size:1.2em;'>{rank_num if mark is None else mark}</div>"
+        f"<div style='flex-grow:1;'>"
+        f"<div style='color:white !important;font-weight:bold;font-size:1.1em;margin-bottom:5px;'>{row['name']} {badges}</div>"
+        f"<div style='color:#FBBF24 !important;font-weight:bold;'>${row['price']:,}</div>"
+        f"<div style='margin-top:8px;'>{scores}</div>"
+        f"</div>"
+        f"<div style='color:#F59E0B !important;font-weight:bold;font-size:0.8em;'>VIEW ></div>"
+        f"</div>"
+        f"</div>"
+        f"</a>"
+    )
+
+def vs_row_html(icon, label, v, other, wins, is_fmt=False):
+    val = f"{int(v):,}" if is_fmt else f"{v:.1f}"
+    cls = "val-win" if wins else "val-lose"
+    return f"<div class='vs-row'><div class='vs-label'><span>{icon}</span> {label}</div><div class='{cls}'>{val}</div></div>"
+
+def vs_card_html(row, other, is_winner, is_phone_a, show_chip=True):
+    # Phone A takes ties on every stat row, like the old create_vs_row()
+    def wins(col):
+        return row[col] >= other[col] if is_phone_a else not (other[col] >= row[col])
+
+    cls = "vs-winner-border" if is_winner else ""
+    rec = "<div style='color:#00FF99 !important;font-weight:900;margin-bottom:10px;'>👑 WINNER</div>" if is_winner else "<div style='height:29px'></div>"
+    chip = ""
+    if show_chip:
+        t = row['chipset'] if pd.notna(row['chipset']) else "-"
+        chip = f"<div class='vs-row'><div class='vs-label'><span>🧠</span> Chipset</div><div style='color:white !important;font-weight:bold;'>{t}</div></div>"
+    rows = (
+        vs_row_html("🚀", "AnTuTu", row['antutu'], other['antutu'], wins('antutu'), True)
+        + vs_row_html("⚡", "Speed", row['perf_score'], other['perf_score'], wins('perf_score'))
+        + vs_row_html("📸", "Cam", row['cam_score'], other['cam_score'], wins('cam_score'))
+        + vs_row_html("🔋", "Batt", row['batt_score'], other['batt_score'], wins('batt_score'))
+    )
+    return f"<div class='vs-card {cls}'>{rec}<div class='hero-title' style='font-size:1.5em !important;'>{row['name']}</div><div class='hero-price' style='font-size:1.5em !important;'>${row['price']:,}</div>{chip}{rows}<a href='{row['link']}' target='_blank' class='amazon-btn'>VIEW DEAL</a></div>"
+
+
+# --- FRAGMENT CACHE ---
+class FragmentCache:
+    # LRU of rendered card markup shared by every session. Keys carry the data
+    # version, so a catalog refresh just lets the old entries age out.
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, render):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        html = render()
+        self.put(key, html)
+        return html
+
+    def put(self, key, html):
+        nbytes = len(html.encode("utf-8"))
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._items[key] = (html, nbytes)
+            self.size += nbytes
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.size -= evicted
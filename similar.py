@@ -0,0 +1,64 @@
+import numpy as np
+
+from engine import OS_CHOICES, SCORE_COLS, top_k
+
+# Per-feature weights of the distance: the five 0-10 scores, then price
+# rescaled to 0-10 against the most expensive phone in the catalog.
+FEATURES = SCORE_COLS + ['price']
+FEATURE_WEIGHTS = {'perf_score': 1.0, 'cam_score': 1.0, 'batt_score': 1.0, 'value': 0.5, 'brand_score': 0.5, 'price': 1.0}
+
+
+class SimilarityIndex:
+    # "Phones like this one": brute-force k-NN over the score matrix plus price,
+    # built once per data version from a ScoreEngine.
+    #  - rows are stored in price order, so a price cap ("cheaper than this")
+    #    is a prefix slice of the feature array rather than a mask
+    #  - squared norms are precomputed: |x - q|^2 = |x|^2 - 2 x.q + |q|^2 is one
+    #    float32 mat-vec, and |q|^2 is the same for every row so it is dropped
+    #  - the OS filter picks the surviving rows before top_k, so the partition
+    #    never sees a long run of masked-out values
+    def __init__(self, engine, weights=None):
+        self.engine = engine
+        self.n = len(engine)
+        w = {**FEATURE_WEIGHTS, **(weights or {})}
+        scale = np.sqrt([w[f] for f in FEATURES])
+        self.order = np.argsort(engine.price, kind='stable')  # ties keep catalog order
+        self.rank = np.empty(self.n, dtype=np.intp)
+        self.rank[self.order] = np.arange(self.n)
+        self.price = engine.price[self.order]
+
+        top_price = self.price[-1] if self.n else 0
+        X = np.column_stack([engine.matrix[self.order], self.price * (10 / top_price if top_price > 0 else 1)])
+        # a missing score sits at the catalog mean so it neither attracts nor repels
+        means = np.nan_to_num(np.nanmean(X, axis=0)) if self.n else np.zeros(len(FEATURES))
+        X = np.where(np.isnan(X), means, X) * scale
+        self.X = np.ascontiguousarray(X, dtype=np.float32)
+        self.sqnorm = np.einsum('ij,ij->i', self.X, self.X)
+        self.os_masks = {o: engine.mask(o)[self.order] for o in OS_CHOICES if o != "Any"}
+
+    def __len__(self):
+        return self.n
+
+    def neighbours(self, pos, k=5, os_choice="Any", max_price=None, cheaper=False):
+        # -> catalog positions of the k phones closest to row pos (never pos
+        # itself), closest first; ties go to the cheaper phone, then catalog
+        # order. Optional OS filter, price cap and/or strictly cheaper than pos.
+        if self.n == 0 or k <= 0:
+            return np.zeros(0, dtype=np.intp)
+        r = self.rank[pos]
+        cut = self.n
+        if max_price is not None: cut = np.searchsorted(self.price, max_price, side='right')
+        if cheaper: cut = min(cut, np.searchsorted(self.price, self.price[r], side='left'))
+
+        d = self.sqnorm[:cut] - 2 * (self.X[:cut] @ self.X[r])
+        if r < cut:
+            d[r] = np.inf
+        rows = None
+        for o, m in self.os_masks.items():
+            if o in os_choice:
+                rows = np.flatnonzero(m[:cut])
+                d = d[rows]
+                break
+        top = top_k(-d, k)
+        top = top[d[top] < np.inf]
+        return self.order[top if rows is None else rows[top]]
@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from engine import SCORE_COLS, STRING_DTYPE
+
+SNAPSHOT_DIR = os.environ.get("TECHCHOOSE_SNAPSHOT_DIR", ".snapshots")
+KEEP_VERSIONS = 3
+
+# Layout:  <root>/CURRENT          -> name of the live version directory
+#          <root>/<version>/meta.json, matrix.npy, <col>.npy | <col>.json
+# Numeric columns, category codes and the score matrix are .npy files opened
+# with mmap_mode='r', so every worker on the box shares the same page-cache
+# pages. Category labels live in meta.json; strings are JSON and come back as
+# Arrow-backed strings rather than Python objects.
+
+
+def write_snapshot(df, version, root=SNAPSHOT_DIR):
+    if df.empty:
+        return None
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, version)
+    if not os.path.isdir(path):
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=root)
+        columns = []
+        for i, col in enumerate(df.columns):
+            s = df[col]
+            entry = {"name": col}
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                fname = f"{i}.npy"
+                np.save(os.path.join(tmp, fname), s.cat.codes.to_numpy())
+                entry["categories"] = s.cat.categories.tolist()
+            elif pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+                fname = f"{i}.npy"
+                np.save(os.path.join(tmp, fname), s.to_numpy())
+            else:
+                fname = f"{i}.json"
+                values = [None if pd.isna(v) else v for v in s.tolist()]
+                with open(os.path.join(tmp, fname), "w", encoding="utf-8") as f:
+                    json.dump(values, f, ensure_ascii=False)
+            columns.append({**entry, "file": fname})
+        np.save(os.path.join(tmp, "matrix.npy"), np.ascontiguousarray(df[SCORE_COLS].to_numpy(dtype=np.float64)))
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": version, "rows": len(df), "columns": columns}, f, ensure_ascii=False)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # another worker won the race
+
+    pointer = os.path.join(root, f".CURRENT-{os.getpid()}")
+    with open(pointer, "w") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(root, "CURRENT"))
+    _prune(root, keep=version)
+    return path
+
+
+def read_snapshot(root=SNAPSHOT_DIR):
+    # -> (df, version, matrix) or None when there is no usable snapshot
+    try:
+        with open(os.path.join(root, "CURRENT")) as f:
+            version = f.read().strip()
+        path = os.path.join(root, version)
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        data = {}
+        for c in meta["columns"]:
+            fpath = os.path.join(path, c["file"])
+            if "categories" in c:
+                data[c["name"]] = pd.Categorical.from_codes(np.load(fpath, mmap_mode="r"), c["categories"])
+            elif c["file"].endswith(".npy"):
+                data[c["name"]] = np.load(fpath, mmap_mode="r")
+            else:
+                with open(fpath, encoding="utf-8") as f:
+                    data[c["name"]] = pd.array(json.load(f), dtype=STRING_DTYPE)
+        matrix = np.load(os.path.join(path, "matrix.npy"), mmap_mode="r")
+    except (OSError, ValueError, KeyError):
+        return None
+    return pd.DataFrame(data, copy=False), version, matrix
+
+
+def _prune(root, keep):
+    versions = [d for d in os.listdir(root) if not d.startswith(".") and os.path.isdir(os.path.join(root, d))]
+    versions.sort(key=lambda d: os.path.getmtime(os.path.join(root, d)), reverse=True)
+    # unlinking files other workers still have mapped is safe on POSIX
+    for d in [v for v in versions if v != keep][KEEP_VERSIONS - 1:]:
+        shutil.rmtree(os.path.join(root, d), ignore_errors=True)
@@ -0,0 +1,154 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+from bench import make_catalog  # noqa: E402
+from catalog import CatalogRefresher  # noqa: E402
+from engine import compact, enrich  # noqa: E402
+
+
+class Sheet(BaseHTTPRequestHandler):
+    # Local stand-in for the published Google Sheet: serves `body` with an
+    # ETag, answers 304 to a matching If-None-Match, or fails with `status`
+    body = b""
+    status = 200
+
+    def do_GET(self):
+        etag = f'"{hash(self.body) & 0xFFFFFFFF:x}"'
+        if self.status != 200:
+            self.send_error(self.status)
+            return
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def csv_bytes(df):
+    return df.to_csv(index=False).encode()
+
+
+def expected(raw):
+    # what a from-scratch enrichment of the same sheet produces
+    return compact(enrich(raw.copy()))
+
+
+def assert_same_catalog(test, got, want):
+    # values only: snapshot columns are memmaps, fresh ones are ndarrays
+    test.assertEqual(list(got.columns), list(want.columns))
+    pd.testing.assert_frame_equal(got.astype(object), want.astype(object))
+
+
+class CatalogRefresherTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), Sheet)
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/sheet.csv"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.raw = make_catalog(300, seed=7)
+        Sheet.body = csv_bytes(self.raw)
+        Sheet.status = 200
+        self.snapshots = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.snapshots, True)
+
+    def enriched_rows(self):
+        h = metrics.REGISTRY.histograms.get('enrich_rows')
+        return h.sum if h else 0
+
+    def test_first_fetch_matches_full_enrichment(self):
+        catalog = CatalogRefresher(self.url)
+        self.assertTrue(catalog.refresh())
+        assert_same_catalog(self, catalog.df, expected(self.raw))
+        self.assertIsNone(catalog.last_error)
+
+    def test_edit_only_enriches_changed_rows(self):
+        catalog = CatalogRefresher(self.url)
+        catalog.refresh()
+        edited = self.raw.copy()
+        edited.loc[5, 'camera'] = 9.9
+        edited.loc[17, 'name'] = "Google Pixel 17 Pro"
+        Sheet.body = csv_bytes(edited)
+        before = self.enriched_rows()
+        self.assertTrue(catalog.refresh())
+        self.assertEqual(self.enriched_rows() - before, 2)
+        assert_same_catalog(self, catalog.df, expected(edited))
+
+    def test_new_maximum_rescores_every_row(self):
+        catalog = CatalogRefresher(self.url)
+        catalog.refresh()
+        edited = self.raw.copy()
+        edited.loc[0, 'antutu'] = int(self.raw['antutu'].max()) * 2
+        Sheet.body = csv_bytes(edited)
+        before = self.enriched_rows()
+        self.assertTrue(catalog.refresh())
+        self.assertEqual(self.enriched_rows() - before, 1)
+        assert_same_catalog(self, catalog.df, expected(edited))
+
+    def test_not_modified(self):
+        catalog = CatalogRefresher(self.url)
+        catalog.refresh()
+        version = catalog.version
+        before = metrics.REGISTRY.counters.get('fetch_not_modified', 0)
+        self.assertFalse(catalog.refresh())
+        self.assertEqual(metrics.REGISTRY.counters.get('fetch_not_modified', 0), before + 1)
+        self.assertEqual(catalog.version, version)
+        self.assertIsNone(catalog.last_error)
+
+    def test_bad_fetch_keeps_last_good_snapshot(self):
+        catalog = CatalogRefresher(self.url)
+        catalog.refresh()
+        version = catalog.version
+        for status, body in [(500, b""), (200, b""), (200, b"name,price,link\n")]:
+            Sheet.status, Sheet.body = status, body
+            # polled twice: the second poll must not 304 its way to "healthy"
+            for _ in range(2):
+                self.assertFalse(catalog.refresh())
+                self.assertIsNotNone(catalog.last_error)
+                self.assertEqual(catalog.version, version)
+                self.assertEqual(len(catalog.df), len(self.raw))
+        # recovers on the next good body
+        Sheet.status, Sheet.body = 200, csv_bytes(self.raw.iloc[:100])
+        self.assertTrue(catalog.refresh())
+        self.assertIsNone(catalog.last_error)
+        assert_same_catalog(self, catalog.df, expected(self.raw.iloc[:100]))
+
+    def test_snapshot_round_trip(self):
+        writer = CatalogRefresher(self.url, snapshot_dir=self.snapshots)
+        writer.refresh()
+        # the writer serves the mapped snapshot it just published
+        self.assertIsInstance(writer.matrix, np.memmap)
+
+        reader = CatalogRefresher("http://127.0.0.1:9/unreachable", snapshot_dir=self.snapshots)
+        self.assertEqual(reader.version, writer.version)
+        self.assertIsInstance(reader.matrix, np.memmap)
+        assert_same_catalog(self, reader.df, expected(self.raw))
+        np.testing.assert_array_equal(reader.matrix, writer.matrix)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench import make_catalog  # noqa: E402
+from engine import JUDGES, SCORE_COLS, CatalogIndex, ScoreEngine, WinnerTable, compact, enrich  # noqa: E402
+
+
+class WinnerTableTest(unittest.TestCase):
+    # the opt-in packed tables must answer exactly what the score vectors do
+    @classmethod
+    def setUpClass(cls):
+        df = enrich(make_catalog(600, seed=3))
+        # missing scores and exact ties, which the >= tie rule and the NaN
+        # rules have to agree on
+        df.loc[df.index[::17], 'perf_score'] = np.nan
+        df.loc[df.index[::29], 'cam_score'] = np.nan
+        df.loc[df.index[1::6], SCORE_COLS] = df.loc[df.index[::6][:len(df.index[1::6])], SCORE_COLS].to_numpy()
+        df = compact(df.drop_duplicates('name').reset_index(drop=True))
+        engine = ScoreEngine(df)
+        cls.vectors = CatalogIndex(engine)
+        cls.tables = CatalogIndex(engine, winner_tables=True)
+
+    def test_tables_are_built(self):
+        for judge in JUDGES:
+            self.assertIsNone(self.vectors.table(judge))
+            self.assertIsInstance(self.tables.table(judge), WinnerTable)
+
+    def test_scores_cover_nan_and_ties(self):
+        for judge in JUDGES:
+            s = self.vectors.judge_scores[judge]
+            self.assertTrue(np.isnan(s).any())
+            real = s[~np.isnan(s)]
+            self.assertLess(len(np.unique(real)), len(real))
+
+    def test_head_to_head_matches_vectors(self):
+        rng = np.random.default_rng(0)
+        names = self.vectors.models
+        for judge in JUDGES:
+            nan = np.flatnonzero(np.isnan(self.vectors.judge_scores[judge]))
+            pairs = [tuple(rng.integers(len(names), size=2)) for _ in range(500)]
+            # every NaN row against a real row, each way round, and itself
+            pairs += [(int(i), 0) for i in nan] + [(0, int(i)) for i in nan] + [(int(i), int(i)) for i in nan]
+            for a, b in pairs:
+                a, b = self.vectors.engine.df['name'][a], self.vectors.engine.df['name'][b]
+                self.assertEqual(self.tables.head_to_head(a, b, judge), self.vectors.head_to_head(a, b, judge), (judge, a, b))
+
+    def test_beaten_by_matches_vectors(self):
+        for judge in JUDGES:
+            for name in self.vectors.models[::7]:
+                np.testing.assert_array_equal(self.tables.beaten_by(name, judge), self.vectors.beaten_by(name, judge))
+
+
+if __name__ == "__main__":
+    unittest.main()
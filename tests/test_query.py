@@ -0,0 +1,72 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench import make_catalog  # noqa: E402
+from engine import OS_CHOICES, PERSONAS, SCORE_COLS, ScoreEngine, compact, enrich  # noqa: E402
+from query import QueryIndex, persona_constraints  # noqa: E402
+
+
+class QueryIndexTest(unittest.TestCase):
+    # search() is an index over ScoreEngine.rank: whatever path it takes
+    # (selective filters, threshold walk, dense fallback) it must return the
+    # exact rank() answer for the same candidates, tie order included
+    @classmethod
+    def setUpClass(cls):
+        df = enrich(make_catalog(8000, seed=11))
+        # missing scores rank below every real one; copied score rows tie
+        df.loc[df.index[::13], 'perf_score'] = np.nan
+        df.loc[df.index[::19], 'cam_score'] = np.nan
+        df.loc[df.index[::41], SCORE_COLS] = np.nan
+        tied = df.index[1::7]
+        df.loc[tied, SCORE_COLS] = df.loc[tied - 1, SCORE_COLS].to_numpy()
+        cls.engine = ScoreEngine(compact(df))
+        cls.index = QueryIndex(cls.engine)
+        cls.chips = [None, "Any"] + cls.index.values('chip_family')
+
+    def assert_same(self, weights, k, ranges, equals):
+        mask = self.index.candidates(ranges, equals)
+        want = self.engine.rank(weights, k, mask)
+        got = self.index.search(weights, k, ranges, equals)
+        np.testing.assert_array_equal(got, want, err_msg=f"{weights} k={k} {ranges} {equals}")
+        return int(mask.sum())
+
+    def test_persona_queries(self):
+        rng = np.random.default_rng(0)
+        for _ in range(300):
+            persona = list(PERSONAS)[rng.integers(len(PERSONAS))]
+            os_choice = OS_CHOICES[rng.integers(len(OS_CHOICES))]
+            max_price = [None, 0, int(rng.integers(100, 2500))][rng.integers(3)]
+            min_cam = [None, 0, float(rng.choice([5, 7, 8.5]))][rng.integers(3)]
+            chip = self.chips[rng.integers(len(self.chips))]
+            weights, ranges, equals = persona_constraints(persona, os_choice, max_price, min_cam, chip)
+            self.assert_same(weights, int(rng.integers(1, 20)), ranges, equals)
+
+    def test_random_weights_and_ranges(self):
+        rng = np.random.default_rng(1)
+        walked = 0
+        for _ in range(300):
+            # sparse integer weights tie often; some negative, some all zero
+            weights = rng.integers(-3, 6, size=len(SCORE_COLS)) * (rng.random(len(SCORE_COLS)) < 0.6)
+            ranges = {}
+            for col in rng.choice(['price'] + SCORE_COLS, size=rng.integers(0, 3), replace=False):
+                lo, hi = sorted(rng.uniform(0, 2500 if col == 'price' else 10, size=2))
+                ranges[str(col)] = (None if rng.random() < 0.3 else lo, None if rng.random() < 0.3 else hi)
+            k = int(rng.integers(1, 30))
+            total = self.assert_same(weights, k, ranges, {})
+            walked += total > max(4 * 256, self.engine.df.shape[0] // 8)
+        # most of these are broad enough to take the threshold walk
+        self.assertGreater(walked, 100)
+
+    def test_k_beyond_matches(self):
+        weights, ranges, equals = persona_constraints("🎮 Gamer", "iOS", max_price=150)
+        total = self.assert_same(weights, 50, ranges, equals)
+        self.assertLess(total, 50)
+
+
+if __name__ == "__main__":
+    unittest.main()